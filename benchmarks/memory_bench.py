@@ -0,0 +1,82 @@
+"""
+Measures the memory used per node by a large synthetic scene graph, with and without slotted core classes.
+Run from the repository root with "python -m benchmarks.memory_bench".
+
+@author Ben Giacalone
+"""
+import gc
+import tracemalloc
+
+from tools.envedit import graph_node
+from tools.envedit.edenv_component import EComponent
+from tools.envedit.graph_node import GraphNode
+from tools.envedit.transform import Transform
+
+NUM_NODES = 100000
+BRANCHING = 10
+
+
+# Returns a copy of a slotted class that stores its attributes in a per-instance dict
+def without_slots(cls):
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in cls.__slots__ and key != "__slots__"}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+UnslottedGraphNode = without_slots(GraphNode)
+UnslottedTransform = without_slots(Transform)
+
+
+# Physics wrapper as it was when every component created its own
+# Physics has gained more state since, which components share, so measuring it would overstate the savings
+class BaselinePhysics:
+
+    def __init__(self, physics_world):
+        self.physics_world = physics_world
+        self.node_ids = {}
+
+
+# Component as it was before components shared a Physics instance
+class UnslottedComponent(without_slots(EComponent)):
+
+    def __init__(self):
+        super().__init__()
+        self.physics = BaselinePhysics(EComponent.physics_world)
+
+
+# Builds a scene of NUM_NODES nodes with one component each, where every node has up to BRANCHING children
+def build_scene(node_class, component_class):
+    nodes = [node_class("Root", [component_class()], use_gui=False)]
+    for i in range(1, NUM_NODES):
+        node = node_class(f"Node {i}", [component_class()], use_gui=False)
+        nodes[(i - 1) // BRANCHING].add_child(node)
+        nodes.append(node)
+    return nodes
+
+
+# Returns the bytes per node of a scene
+def measure(node_class, transform_class, component_class):
+    gc.collect()
+    graph_node.Transform = transform_class
+    try:
+        tracemalloc.start()
+        nodes = build_scene(node_class, component_class)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        graph_node.Transform = Transform
+    del nodes
+    return size / NUM_NODES
+
+
+def main():
+    before_size = measure(UnslottedGraphNode, UnslottedTransform, UnslottedComponent)
+    after_size = measure(GraphNode, Transform, EComponent)
+
+    print(f"{NUM_NODES} nodes")
+    print(f"{'before':<10}{before_size:>10.0f} bytes per node")
+    print(f"{'after':<10}{after_size:>10.0f} bytes per node")
+    print(f"Saved {before_size - after_size:.0f} bytes per node ({(1 - after_size / before_size) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Checks that the nodes of dynamic rigid bodies follow their bodies, by comparing the world matrix of every node with
+the matrix of its body after each step of a scene of tumbling boxes.
+Half of the boxes start with a Y rotation of +-90 degrees, where euler angles are in gimbal lock.
+Run from the repository root with "python -m benchmarks.physics_sync_check".
+
+@author Ben Giacalone
+"""
+from math import pi
+
+import numpy as np
+from panda3d.core import NodePath
+
+from components.rigidbody import Rigidbody
+from tools.run.simulation import Simulation
+
+NUM_BOXES = 12
+NUM_STEPS = 400
+TOLERANCE = 1e-5
+
+
+# Returns the dict of a node with a rigid body and a cube collider
+def body_dict(name, translation, rotation, mass, size):
+    return {"name": name, "id": f"{name:0<16}",
+            "components": [{"script_path": "components.rigidbody",
+                            "values": {"mass": str(mass), "kinematic": "False"}},
+                           {"script_path": "components.cube_collider",
+                            "values": {"center": ["0", "0", "0"], "size": [str(x) for x in size]}}],
+            "transform": {"translation": translation, "rotation": rotation, "scale": [1, 1, 1]},
+            "children": []}
+
+
+# Returns the dict of a floor with boxes dropped onto it
+def scene_dict():
+    rng = np.random.default_rng(0)
+    children = [body_dict("floor", [0, 0, -1], [0, 0, 0], 0, [50, 50, 1])]
+    for i in range(NUM_BOXES):
+        pitch = (pi / 2 if i % 2 == 0 else -pi / 2) if i < NUM_BOXES // 2 else rng.uniform(-pi, pi)
+        rotation = [rng.uniform(-pi, pi), pitch, rng.uniform(-pi, pi)]
+        children.append(body_dict(f"box{i}", [(i % 4) * 2.0, (i // 4) * 2.0, 1 + i * 0.3], rotation, 1, [1, 1, 1]))
+    return {"name": "Root", "id": "root000000000000", "components": [],
+            "transform": {"translation": [0, 0, 0], "rotation": [0, 0, 0], "scale": [1, 1, 1]},
+            "children": children}
+
+
+def main():
+    simulation = Simulation(scene_dict(), {}, NodePath("render"))
+    bodies = [(node, next(component for component in node.data if isinstance(component, Rigidbody)).body_path)
+              for node in simulation.root_node.children]
+
+    worst = 0
+    for step in range(NUM_STEPS):
+        simulation.step(1 / 60)
+        for node, body_path in bodies:
+            # Panda matrices are transposed, since they transform row vectors
+            body_matrix = np.array(body_path.getMat()).T
+            error = np.abs(node.transform.get_world_matrix() - body_matrix).max()
+            assert error < TOLERANCE, f"{node.name} is {error} away from its body after step {step}"
+            worst = max(worst, error)
+
+    simulation.destroy()
+    print(f"Largest difference between node and body matrices: {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measures the time to load many copies of a robot, by rebuilding each copy from its dict or by instantiating a prefab.
+Run from the repository root with "python -m benchmarks.prefab_bench".
+
+@author Ben Giacalone
+"""
+import time
+
+from tools.envedit.graph_node import GraphNode
+from tools.envedit.prefab import Prefab
+
+NUM_COPIES = 200
+NUM_LINKS = 10
+
+
+# Returns the dict of a robot made of a chain of links, where the base's mesh points at the last link
+def robot_dict():
+    def link_dict(i, children):
+        return {"name": f"Link {i}", "id": f"link{i:012d}",
+                "components": [{"script_path": "components.rigidbody", "values": {"mass": "1", "kinematic": "False"}},
+                               {"script_path": "components.cube_collider",
+                                "values": {"center": ["0", "0", "0"], "size": ["1", "0.2", "0.2"]}}],
+                "transform": {"translation": [1, 0, 0], "rotation": [0, 0, 0.1], "scale": [1, 1, 1]},
+                "children": children}
+
+    links = []
+    for i in reversed(range(NUM_LINKS)):
+        links = [link_dict(i, links)]
+    return {"name": "Robot", "id": "robot00000000000",
+            "components": [{"script_path": "components.mesh_graphic",
+                            "values": {"mesh": "robot", "armature_node": f"link{NUM_LINKS - 1:012d}"}}],
+            "transform": {"translation": [0, 0, 0], "rotation": [0, 0, 0], "scale": [1, 1, 1]},
+            "children": links}
+
+
+def main():
+    node_dict = robot_dict()
+
+    start = time.perf_counter()
+    for _ in range(NUM_COPIES):
+        node = GraphNode.dict_to_scene_graph(node_dict, use_gui=False)
+        GraphNode.replace_node_props(node, GraphNode.replace_id(node))
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prefab = Prefab(node_dict)
+    for _ in range(NUM_COPIES):
+        prefab.instantiate(use_gui=False)
+    after = time.perf_counter() - start
+
+    print(f"{NUM_COPIES} copies of a {NUM_LINKS + 1} node robot")
+    print(f"{'dict_to_scene_graph + replace_id':<34}{before * 1000:>10.1f} ms")
+    print(f"{'Prefab.instantiate':<34}{after * 1000:>10.1f} ms")
+    print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Checks that a node removed by a component with GraphNode.remove_child stops receiving events and colliding, by
+removing a box from inside an update handler and looking for its handlers and rigid body afterwards.
+Run from the repository root with "python -m benchmarks.remove_node_check".
+
+@author Ben Giacalone
+"""
+import numpy as np
+from panda3d.core import NodePath
+
+from tools.envedit.edenv_component import EComponent
+from tools.run.event import handler
+from tools.run.simulation import Simulation
+
+REMOVE_STEP = 10
+NUM_STEPS = 30
+
+
+# Counts the updates its node receives
+class UpdateCounter(EComponent):
+
+    def __init__(self):
+        EComponent.__init__(self)
+        self.updates = 0
+
+    @handler()
+    def handle_update(self):
+        self.updates += 1
+
+
+# Removes a child of its node after a number of updates, the way component scripts remove nodes
+class ChildRemover(EComponent):
+
+    def __init__(self, child, remove_step):
+        EComponent.__init__(self)
+        self.child = child
+        self.remove_step = remove_step
+        self.updates = 0
+
+    @handler()
+    def handle_update(self):
+        self.updates += 1
+        if self.updates == self.remove_step:
+            self.node.remove_child(self.child)
+
+
+# Returns the dict of a node with a rigid body and a cube collider
+def body_dict(name, translation, mass, size):
+    return {"name": name, "id": f"{name:0<16}",
+            "components": [{"script_path": "components.rigidbody",
+                            "values": {"mass": str(mass), "kinematic": "False"}},
+                           {"script_path": "components.cube_collider",
+                            "values": {"center": ["0", "0", "0"], "size": [str(x) for x in size]}}],
+            "transform": {"translation": translation, "rotation": [0, 0, 0], "scale": [1, 1, 1]},
+            "children": []}
+
+
+# Adds a component to a node of a running simulation
+def add_component(simulation, node, component):
+    node.add_component(component)
+    component.event_bus = simulation.event_bus
+    component.physics = simulation.physics
+    component.trial = simulation.trial
+    simulation.event_bus.register(component)
+
+
+def main():
+    scene_dict = {"name": "Root", "id": "root000000000000", "components": [],
+                  "transform": {"translation": [0, 0, 0], "rotation": [0, 0, 0], "scale": [1, 1, 1]},
+                  "children": [body_dict("floor", [0, 0, -1], 0, [50, 50, 1]),
+                               body_dict("box", [0, 0, 0.5], 1, [1, 1, 1])]}
+    simulation = Simulation(scene_dict, {}, NodePath("render"))
+    root = simulation.root_node
+    box = root.find_child_by_name("box")
+    counter = UpdateCounter()
+    add_component(simulation, box, counter)
+    add_component(simulation, root, ChildRemover(box, REMOVE_STEP))
+    box_body = box.data[1].body_path.node()
+
+    for _ in range(NUM_STEPS):
+        simulation.step(1 / 60)
+
+    # The box only received updates up to the one it was removed in
+    assert counter.updates <= REMOVE_STEP, f"Removed node received {counter.updates} updates"
+    for component in box.data:
+        assert component not in simulation.event_bus.components, f"{type(component).__name__} is still registered"
+
+    # Its body is out of the physics world, so rays pass through to the floor
+    assert box_body not in list(simulation.physics_world.getRigidBodies()), "Removed node's body is still in the world"
+    assert box_body.name not in simulation.physics.contacts.subscribers, "Removed node still gets contact changes"
+    hit = simulation.physics.raycast(np.array([0.0, 0, 10]), np.array([0.0, 0, -1]))
+    assert hit is not None and hit.hit_node_id == "floor00000000000", hit and hit.hit_node_id
+
+    simulation.destroy()
+    print("Removed node's handlers and rigid body are gone")
+
+
+if __name__ == "__main__":
+    main()
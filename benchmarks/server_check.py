@@ -0,0 +1,76 @@
+"""
+Checks that observations and actions holding NumPy values make a round trip through the environment server, with
+numeric arrays keeping their dtype and shape, and that results which can't be encoded are answered with an error
+instead of closing the connection.
+Run from the repository root with "python -m benchmarks.server_check".
+
+@author Ben Giacalone
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from tools.run.server import EnvironmentServer, EnvironmentClient, STEP
+
+
+# Server that answers every request on environment copy i with results[i], without loading an environment
+# Steps are answered with their actions, so actions sent by clients can be checked
+class FixedResultServer(EnvironmentServer):
+
+    def __init__(self, results):
+        self.results = results
+
+    async def handle_request(self, message_type, env_index, payload):
+        if message_type == STEP:
+            return payload
+        return self.results[env_index]
+
+
+def main():
+    observation = {"position": np.array([0.5, -1.25, 4.6]),
+                   "joints": np.arange(6, dtype=np.float32).reshape(2, 3),
+                   "contacts": np.int64(3),
+                   "touching": np.bool_(True)}
+    server = FixedResultServer([observation, {"handle": object()}])
+
+    path = os.path.join(tempfile.mkdtemp(), "edenv.sock")
+    threading.Thread(target=lambda: asyncio.run(server.serve_unix(path)), daemon=True).start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    client = EnvironmentClient(path)
+
+    # Arrays arrive as arrays with the same dtype and shape, scalars as numbers
+    received = client.observe(0)
+    assert received.keys() == observation.keys(), received
+    for name in ("position", "joints"):
+        assert received[name].dtype == observation[name].dtype and np.array_equal(received[name], observation[name])
+    assert received["contacts"] == 3 and received["touching"] is True, received
+
+    # Actions reach the server the same way, including views and arrays without dimensions
+    actions = {"forces": np.linspace(0, 1, 12).reshape(3, 4)[:, ::2], "grip": np.array(0.5, dtype=np.float32),
+               "keys": [np.array([True, False]), np.zeros((0, 3), dtype=np.int16)], "mode": "walk"}
+    echoed = client.step(0, actions)
+    for sent, received_array in [(actions["forces"], echoed["forces"]), (actions["grip"], echoed["grip"]),
+                                 *zip(actions["keys"], echoed["keys"])]:
+        assert received_array.dtype == sent.dtype and received_array.shape == sent.shape, received_array
+        assert np.array_equal(received_array, sent)
+    assert echoed["mode"] == "walk"
+
+    # Results that can't be encoded are reported as errors, and the connection stays open
+    try:
+        client.observe(1)
+        raise AssertionError("Expected an error reply.")
+    except RuntimeError as e:
+        print(f"Error reply: {e}")
+    assert np.array_equal(client.observe(0)["joints"], observation["joints"])
+
+    client.close()
+    print("Server round trip OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measures the per-call cost of the transform math kernels against the matrix building they replaced.
+Run from the repository root with "python -m benchmarks.transform_bench".
+
+@author Ben Giacalone
+"""
+import timeit
+from math import cos, sin, atan2, sqrt
+
+import numpy as np
+
+from tools.envedit.transform import Transform, compose_matrix, decompose_matrix
+
+NUMBER = 20000
+
+
+# Composes a matrix by building and multiplying translation, rotation and scale matrices
+def compose_matrix_reference(trans, rot, scale):
+    trans_mat = np.array([[1, 0, 0, trans[0]],
+                          [0, 1, 0, trans[1]],
+                          [0, 0, 1, trans[2]],
+                          [0, 0, 0, 1]])
+    x_rot_mat = np.array([[1, 0, 0, 0],
+                          [0, cos(rot[0]), -sin(rot[0]), 0],
+                          [0, sin(rot[0]), cos(rot[0]), 0],
+                          [0, 0, 0, 1]])
+    y_rot_mat = np.array([[cos(rot[1]), 0, sin(rot[1]), 0],
+                          [0, 1, 0, 0],
+                          [-sin(rot[1]), 0, cos(rot[1]), 0],
+                          [0, 0, 0, 1]])
+    z_rot_mat = np.array([[cos(rot[2]), -sin(rot[2]), 0, 0],
+                          [sin(rot[2]), cos(rot[2]), 0, 0],
+                          [0, 0, 1, 0],
+                          [0, 0, 0, 1]])
+    scale_mat = np.array([[scale[0], 0, 0, 0],
+                          [0, scale[1], 0, 0],
+                          [0, 0, scale[2], 0],
+                          [0, 0, 0, 1]])
+    return trans_mat.dot(z_rot_mat.dot(y_rot_mat.dot(x_rot_mat)).dot(scale_mat))
+
+
+# Decomposes a matrix by normalizing its columns with an inverse scale matrix
+def decompose_matrix_reference(matrix):
+    temp_mat = matrix.copy()
+    trans = np.array([temp_mat[0][3], temp_mat[1][3], temp_mat[2][3]])
+    temp_mat[0][3] = 0
+    temp_mat[1][3] = 0
+    temp_mat[2][3] = 0
+    scale = np.array([np.linalg.norm(np.array([temp_mat[0][0], temp_mat[1][0], temp_mat[2][0]])),
+                      np.linalg.norm(np.array([temp_mat[0][1], temp_mat[1][1], temp_mat[2][1]])),
+                      np.linalg.norm(np.array([temp_mat[0][2], temp_mat[1][2], temp_mat[2][2]]))])
+    temp_mat = temp_mat.dot(np.array([[1 / scale[0], 0, 0, 0],
+                                      [0, 1 / scale[1], 0, 0],
+                                      [0, 0, 1 / scale[2], 0],
+                                      [0, 0, 0, 1]]))
+    rot = np.array([atan2(temp_mat[2][1], temp_mat[2][2]),
+                    atan2(-temp_mat[2][0], sqrt(pow(temp_mat[2][1], 2) + pow(temp_mat[2][2], 2))),
+                    atan2(temp_mat[1][0], temp_mat[0][0])])
+    return trans, rot, scale
+
+
+# Returns the average cost of a call in microseconds
+def time_call(func):
+    return timeit.timeit(func, number=NUMBER) / NUMBER * 1e6
+
+
+def main():
+    trans = np.array([1.0, -2.0, 0.5])
+    rot = np.array([0.3, -0.7, 1.1])
+    scale = np.array([1.5, 0.5, 2.0])
+    matrix = compose_matrix_reference(trans, rot, scale)
+    out = np.empty((4, 4))
+    trans_out, rot_out, scale_out = np.empty(3), np.empty(3), np.empty(3)
+
+    # A child whose parent moves every call, so world matrices have to be recalculated
+    parent = Transform()
+    child = Transform()
+    child.set_parent(parent)
+    child.set_translation(trans)
+    child.set_rotation(rot)
+    child.set_scale(scale)
+
+    def world_rot_scale_reference():
+        world_mat = parent.get_world_matrix().dot(child.get_mat())
+        decompose_matrix_reference(world_mat)
+        decompose_matrix_reference(world_mat)
+
+    def world_rot_scale():
+        child.get_world_rotation()
+        child.get_world_scale()
+
+    def world_rot_scale_moved():
+        parent.set_translation(trans)
+        child.get_world_rotation()
+        child.get_world_scale()
+
+    results = [
+        ("compose", time_call(lambda: compose_matrix_reference(trans, rot, scale)),
+         time_call(lambda: compose_matrix(trans, rot, scale, out))),
+        ("decompose", time_call(lambda: decompose_matrix_reference(matrix)),
+         time_call(lambda: decompose_matrix(matrix, trans_out, rot_out, scale_out))),
+        ("world rotation + scale", time_call(world_rot_scale_reference), time_call(world_rot_scale)),
+        ("world rotation + scale, parent moved", time_call(world_rot_scale_reference),
+         time_call(world_rot_scale_moved)),
+    ]
+
+    print(f"{'operation':<40}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in results:
+        print(f"{name:<40}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,14 +26,7 @@ class Armature(EComponent):
                 "bind_matrices": PropertyType.ARRAY}
 
     def on_gui_change(self):
-        self.bind_mats.clear()
-        for bind_matrix in self.property_vals["bind_matrices"]:
-            mat = np.identity(4)
-            elements = bind_matrix.split(",")
-            for x in range(4):
-                for y in range(4):
-                    mat[y][x] = float(elements[y * 4 + x])
-            self.bind_mats.append(mat)
+        self.parse_bind_matrices()
 
     def on_gui_change_selected(self):
         # Update node list
@@ -59,13 +52,7 @@ class Armature(EComponent):
 
     def start(self):
         # Set up bind matrices
-        for bind_matrix in self.property_vals["bind_matrices"]:
-            mat = np.identity(4)
-            elements = bind_matrix.split(",")
-            for x in range(4):
-                for y in range(4):
-                    mat[y][x] = float(elements[y * 4 + x])
-            self.bind_mats.append(mat)
+        self.parse_bind_matrices()
 
         # Save nodes
         nodes_len = len(self.property_vals["nodes"])
@@ -87,6 +74,11 @@ class Armature(EComponent):
             bind_mat = self.bind_mats[i]
             self.bone_mats.setElement(i, helper.np_mat4_to_panda(node.transform.get_world_matrix().dot(bind_mat)))
 
+    # Parses the bind matrices, which are stored as 16 comma separated floats in row major order
+    def parse_bind_matrices(self):
+        self.bind_mats = [np.array(bind_matrix.split(","), dtype=float).reshape(4, 4)
+                          for bind_matrix in self.property_vals["bind_matrices"]]
+
     # Updates bone matrices
     def update_bone_matrices(self):
         self.bone_mats = PTA_LMatrix4f()
@@ -10,7 +10,6 @@ from components.rigidbody import Rigidbody
 from tools.envedit import helper
 from tools.envedit.edenv_component import EComponent
 from tools.envedit.property_type import PropertyType
-from tools.run.event import handler
 
 
 class ConeConstraint(EComponent):
@@ -46,6 +45,10 @@ class ConeConstraint(EComponent):
                                                   rot[2]))
                 self.parent_path.setScale(helper.np_vec3_to_panda(self.node.parent.transform.get_world_scale()))
 
+                # The parent node's body follows the parent node, only being moved when the parent node moves
+                if self.update_parent:
+                    self.physics.bodies.add(self.parent_path, self.node.parent.transform, True)
+
                 # Create constraint
                 child_transform = TransformState.make_pos(LVector3f(0, 0, 0))
                 node_pos = self.node.transform.get_translation() * self.node.transform.get_world_scale()
@@ -54,18 +57,7 @@ class ConeConstraint(EComponent):
                                                        self.parent_path.node(),
                                                        child_transform,
                                                        parent_transform)
-                constraint.set_limit(float(self.property_vals["swing_1"]),
-                                     float(self.property_vals["swing_2"]),
-                                     float(self.property_vals["max_twist"]))
+                constraint.set_limit(self.property_vals["swing_1"],
+                                     self.property_vals["swing_2"],
+                                     self.property_vals["max_twist"])
                 EComponent.physics_world.attachConstraint(constraint)
-
-    @handler()
-    def handle_update(self):
-        # Update parent node
-        if self.update_parent:
-            self.parent_path.setPos(helper.np_vec3_to_panda(self.node.parent.transform.get_world_translation()))
-            rot = np.degrees(self.node.parent.transform.get_world_rotation())
-            self.parent_path.setHpr(LVector3f(rot[1],
-                                              rot[0],
-                                              rot[2]))
-            self.parent_path.setScale(helper.np_vec3_to_panda(self.node.parent.transform.get_world_scale()))
\ No newline at end of file
@@ -14,7 +14,7 @@ from tools.envedit.gizmos.sphere_handle_gizmo import SphereHandleGizmo
 from tools.envedit.gizmos.wire_cube_gizmo import WireCubeGizmo
 from tools.envedit.property_type import PropertyType
 from tools.envedit.transform import Transform
-from tools.run.event import handler, send_event
+from tools.run.shape_cache import ShapeCache
 
 
 class CubeCollider(EComponent):
@@ -33,7 +33,6 @@ class CubeCollider(EComponent):
         self.start_center = 0
 
         self.rigidbody_component = None
-        self.touching = []
 
     @staticmethod
     def get_properties():
@@ -118,12 +117,8 @@ class CubeCollider(EComponent):
         # Transform cube
         cube_transform = Transform()
         cube_transform.set_parent_matrix(self.node.transform.get_world_matrix())
-        cube_transform.set_scale(np.array([float(self.property_vals["size"][0]),
-                                           float(self.property_vals["size"][1]),
-                                           float(self.property_vals["size"][2])]))
-        cube_transform.set_translation(np.array([float(self.property_vals["center"][0]),
-                                                 float(self.property_vals["center"][1]),
-                                                 float(self.property_vals["center"][2])]))
+        cube_transform.set_scale(self.property_vals["size"])
+        cube_transform.set_translation(self.property_vals["center"])
         self.cube_gizmo.set_world_matrix(cube_transform.get_world_matrix())
 
         # Transform sphere handles
@@ -185,77 +180,68 @@ class CubeCollider(EComponent):
         for component in self.node.data:
             if isinstance(component, Rigidbody):
                 self.rigidbody_component = component
-                size = np.array([float(self.property_vals["size"][0]) / 2,
-                                 float(self.property_vals["size"][1]) / 2,
-                                 float(self.property_vals["size"][2]) / 2])
-                shape = BulletBoxShape(helper.np_vec3_to_panda(size))
-                center = LVector3f(float(self.property_vals["center"][0]),
-                                   float(self.property_vals["center"][1]),
-                                   float(self.property_vals["center"][2]))
+                size = self.property_vals["size"] / 2
+                shape = CubeCollider.create_shape(component, size)
+                center = LVector3f(*self.property_vals["center"])
                 component.body_path.node().add_shape(shape, TransformState.make_pos(center))
+                self.physics.contacts.subscribe(component.body_path.node().name, self.on_contacts_changed)
 
-    @handler()
-    def handle_update(self):
-        result = self.physics.physics_world.contactTest(self.rigidbody_component.body_path.node())
-        touching = []
-
-        for contact in result.getContacts():
-            id_1 = contact.getNode0().name[:-11]
-            id_2 = contact.getNode1().name[:-11]
-            touching.append(id_2)
-
-            # Check if entered this frame
-            if id_2 not in self.touching:
-                send_event("main", "collision_enter", id_1, id_2)
-
-        # Check if exited this frame
-        for id in self.touching:
-            if id not in touching:
-                send_event("main", "collision_exit", self.node.id, id)
-
-        self.touching = touching
+    # Returns a box shape for the rigidbody component "rigidbody"
+    # Kinematic bodies can change scale, so they get their own shapes, others share shapes with the same size and scale
+    @staticmethod
+    def create_shape(rigidbody, half_extents):
+        if rigidbody.kinematic:
+            return BulletBoxShape(helper.np_vec3_to_panda(half_extents))
+        return ShapeCache.get_box(half_extents, rigidbody.body_path.getScale())
+
+    # Posts collision events when bodies start or stop touching the rigid body
+    def on_contacts_changed(self, entered_ids, exited_ids):
+        for id in entered_ids:
+            self.event_bus.post_event("main", "collision_enter", self.node.id, id)
+        for id in exited_ids:
+            self.event_bus.post_event("main", "collision_exit", self.node.id, id)
 
     # Handles a sphere being selected
     def handle_sphere_selected(self, data):
         if data == "x_min":
-            self.start_size = float(self.property_vals["size"][0])
-            self.start_center = float(self.property_vals["center"][0])
+            self.start_size = self.property_vals["size"][0]
+            self.start_center = self.property_vals["center"][0]
         elif data == "x_max":
-            self.start_size = float(self.property_vals["size"][0])
-            self.start_center = float(self.property_vals["center"][0])
+            self.start_size = self.property_vals["size"][0]
+            self.start_center = self.property_vals["center"][0]
         elif data == "y_min":
-            self.start_size = float(self.property_vals["size"][1])
-            self.start_center = float(self.property_vals["center"][1])
+            self.start_size = self.property_vals["size"][1]
+            self.start_center = self.property_vals["center"][1]
         elif data == "y_max":
-            self.start_size = float(self.property_vals["size"][1])
-            self.start_center = float(self.property_vals["center"][1])
+            self.start_size = self.property_vals["size"][1]
+            self.start_center = self.property_vals["center"][1]
         elif data == "z_min":
-            self.start_size = float(self.property_vals["size"][2])
-            self.start_center = float(self.property_vals["center"][2])
+            self.start_size = self.property_vals["size"][2]
+            self.start_center = self.property_vals["center"][2]
         elif data == "z_max":
-            self.start_size = float(self.property_vals["size"][2])
-            self.start_center = float(self.property_vals["center"][2])
+            self.start_size = self.property_vals["size"][2]
+            self.start_center = self.property_vals["center"][2]
 
     # Handles a sphere handle dragging
     def handle_sphere_drag(self, drag_amount, data):
         if data == "x_min":
-            self.property_vals["size"][0] = str(self.start_size - drag_amount)
-            self.property_vals["center"][0] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][0] = self.start_size - drag_amount
+            self.property_vals["center"][0] = self.start_center + drag_amount / 2
         elif data == "x_max":
-            self.property_vals["size"][0] = str(self.start_size + drag_amount)
-            self.property_vals["center"][0] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][0] = self.start_size + drag_amount
+            self.property_vals["center"][0] = self.start_center + drag_amount / 2
         elif data == "y_min":
-            self.property_vals["size"][1] = str(self.start_size - drag_amount)
-            self.property_vals["center"][1] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][1] = self.start_size - drag_amount
+            self.property_vals["center"][1] = self.start_center + drag_amount / 2
         elif data == "y_max":
-            self.property_vals["size"][1] = str(self.start_size + drag_amount)
-            self.property_vals["center"][1] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][1] = self.start_size + drag_amount
+            self.property_vals["center"][1] = self.start_center + drag_amount / 2
         elif data == "z_min":
-            self.property_vals["size"][2] = str(self.start_size - drag_amount)
-            self.property_vals["center"][2] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][2] = self.start_size - drag_amount
+            self.property_vals["center"][2] = self.start_center + drag_amount / 2
         elif data == "z_max":
-            self.property_vals["size"][2] = str(self.start_size + drag_amount)
-            self.property_vals["center"][2] = str(self.start_center + drag_amount / 2)
+            self.property_vals["size"][2] = self.start_size + drag_amount
+            self.property_vals["center"][2] = self.start_center + drag_amount / 2
 
         self.node.component_property_changed_selected()
 
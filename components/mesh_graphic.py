@@ -2,8 +2,6 @@
 Renders a mesh.
 
 """
-import json
-from pathlib import Path
 
 from tools.envedit.edenv_component import EComponent
 from tools.envedit.envedit_data import EnveditData
@@ -101,12 +99,11 @@ class MeshGraphic(EComponent):
             self.mesh_gizmo.destroy()
             self.mesh_gizmo = None
 
-        # Open mesh file
-        mesh_path = Path("resources") / (mesh_name + ".json")
-        if not mesh_path.exists():
+        # Get mesh geometry, which is shared by all meshes with the same file
+        mesh_geom = MeshGizmo.get_mesh_geom(mesh_name)
+        if mesh_geom is None:
             return
-        with open(mesh_path, "r") as file:
-            mesh_json = json.load(file)
-            self.mesh_gizmo = MeshGizmo(mesh_json)
-            self.mesh_gizmo.on_pressed_callback = self.pressed_callback
-            GizmoSystem.add_gizmo(self.mesh_gizmo)
+        self.mesh_gizmo = MeshGizmo()
+        self.mesh_gizmo.set_geom(*mesh_geom)
+        self.mesh_gizmo.on_pressed_callback = self.pressed_callback
+        GizmoSystem.add_gizmo(self.mesh_gizmo)
@@ -9,7 +9,6 @@ from panda3d.core import PandaNode, LVector3f, LPoint3f
 from components.rigidbody import Rigidbody
 from tools.envedit import helper
 from tools.envedit.edenv_component import EComponent
-from tools.run.event import handler
 
 
 class PointConstraint(EComponent):
@@ -44,6 +43,10 @@ class PointConstraint(EComponent):
                                                   rot[2]))
                 self.parent_path.setScale(helper.np_vec3_to_panda(self.node.parent.transform.get_world_scale()))
 
+                # The parent node's body follows the parent node, only being moved when the parent node moves
+                if self.update_parent:
+                    self.physics.bodies.add(self.parent_path, self.node.parent.transform, True)
+
                 # Create constraint
                 node_pos = self.node.transform.get_translation() * self.node.transform.get_world_scale()
                 constraint = BulletSphericalConstraint(component.body_path.node(),
@@ -51,14 +54,3 @@ class PointConstraint(EComponent):
                                                        LVector3f(0, 0, 0),
                                                        LVector3f(node_pos[0], node_pos[1], node_pos[2]))
                 EComponent.physics_world.attachConstraint(constraint)
-
-    @handler()
-    def handle_update(self):
-        # Update parent node
-        if self.update_parent:
-            self.parent_path.setPos(helper.np_vec3_to_panda(self.node.parent.transform.get_world_translation()))
-            rot = np.degrees(self.node.parent.transform.get_world_rotation())
-            self.parent_path.setHpr(LVector3f(rot[1],
-                                              rot[0],
-                                              rot[2]))
-            self.parent_path.setScale(helper.np_vec3_to_panda(self.node.parent.transform.get_world_scale()))
@@ -77,15 +77,9 @@ class Position(EComponent):
 
     def on_gui_change_selected(self):
         # Set transform properties
-        self.node.transform.set_translation(np.array([float(self.property_vals["pos"][0]),
-                                                      float(self.property_vals["pos"][1]),
-                                                      float(self.property_vals["pos"][2])]))
-        self.node.transform.set_rotation(np.array([math.radians(float(self.property_vals["rot"][0])),
-                                                   math.radians(float(self.property_vals["rot"][1])),
-                                                   math.radians(float(self.property_vals["rot"][2]))]))
-        self.node.transform.set_scale(np.array([float(self.property_vals["scale"][0]),
-                                                float(self.property_vals["scale"][1]),
-                                                float(self.property_vals["scale"][2])]))
+        self.node.transform.set_translation(self.property_vals["pos"])
+        self.node.transform.set_rotation(np.radians(self.property_vals["rot"]))
+        self.node.transform.set_scale(self.property_vals["scale"])
 
         node_world_pos = self.node.transform.get_world_translation()
         node_rot_mat = self.node.transform.get_rot_mat(self.node.transform.get_world_rotation())
@@ -269,9 +263,7 @@ class Position(EComponent):
         self.node.transform.set_world_translation(new_pos)
 
         # Set position component's properties
-        self.property_vals["pos"][0] = str(self.node.transform.trans[0])
-        self.property_vals["pos"][1] = str(self.node.transform.trans[1])
-        self.property_vals["pos"][2] = str(self.node.transform.trans[2])
+        self.property_vals["pos"][:] = self.node.transform.trans
 
         self.node.component_property_changed_selected()
 
@@ -284,9 +276,7 @@ class Position(EComponent):
         self.node.transform.set_rotation(new_rot)
 
         # Set position component's properties
-        self.property_vals["rot"][0] = str(math.degrees(self.node.transform.rot[0]))
-        self.property_vals["rot"][1] = str(math.degrees(self.node.transform.rot[1]))
-        self.property_vals["rot"][2] = str(math.degrees(self.node.transform.rot[2]))
+        self.property_vals["rot"][:] = np.degrees(self.node.transform.rot)
 
         self.node.component_property_changed_selected()
 
@@ -303,9 +293,7 @@ class Position(EComponent):
         self.node.transform.set_world_scale(new_scale)
 
         # Set position component's properties
-        self.property_vals["scale"][0] = str(self.node.transform.scale[0])
-        self.property_vals["scale"][1] = str(self.node.transform.scale[1])
-        self.property_vals["scale"][2] = str(self.node.transform.scale[2])
+        self.property_vals["scale"][:] = self.node.transform.scale
 
         self.node.component_property_changed_selected()
 
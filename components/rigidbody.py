@@ -9,7 +9,6 @@ from panda3d.core import LVector3f
 from tools.envedit import helper
 from tools.envedit.edenv_component import EComponent
 from tools.envedit.property_type import PropertyType
-from tools.run.event import handler
 
 
 class Rigidbody(EComponent):
@@ -25,9 +24,9 @@ class Rigidbody(EComponent):
                 "kinematic": PropertyType.BOOL}
 
     def start(self):
-        self.kinematic = self.property_vals["kinematic"].lower() == "true"
+        self.kinematic = self.property_vals["kinematic"]
         body_node = BulletRigidBodyNode(self.node.id + "_rigid_body")
-        body_node.set_mass(float(self.property_vals["mass"]))
+        body_node.set_mass(self.property_vals["mass"])
         self.body_path = EComponent.panda_root_node.attach_new_node(body_node)
         self.body_path.setPos(helper.np_vec3_to_panda(self.node.transform.get_world_translation()))
         rot = np.degrees(self.node.transform.get_world_rotation())
@@ -36,16 +35,4 @@ class Rigidbody(EComponent):
                                         rot[2]))
         self.body_path.setScale(helper.np_vec3_to_panda(self.node.transform.get_world_scale()))
         EComponent.physics_world.attachRigidBody(body_node)
-
-    @handler()
-    def handle_update(self):
-        if self.body_path is not None:
-            if self.kinematic:
-                self.body_path.setPos(helper.np_vec3_to_panda(self.node.transform.get_world_translation()))
-                rot = np.degrees(self.node.transform.get_world_rotation())
-                self.body_path.setHpr(LVector3f(rot[1],
-                                                rot[0],
-                                                rot[2]))
-                self.body_path.setScale(helper.np_vec3_to_panda(self.node.transform.get_world_scale()))
-            else:
-                self.node.transform.set_world_matrix(helper.panda_mat4_to_np(self.body_path.getMat()))
+        self.physics.bodies.add(self.body_path, self.node.transform, self.kinematic)
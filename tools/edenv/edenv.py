@@ -11,6 +11,7 @@ import yaml
 from tools.envedit import envedit as edenv_envedit
 from tools.resimport import resimport as edenv_resimport
 from tools.run import run as edenv_run
+from tools.run import server as edenv_server
 
 
 @click.group()
@@ -81,9 +82,25 @@ def resimport(ctx, files):
 @click.option("-c", "--config", type=click.File('r'))
 @click.option("-t", "--trials", type=int, default=-1)
 @click.option("-v", "--visualize", type=int, default=10)
+@click.option("-n", "--num-envs", type=int, default=1)
+@click.option("-w", "--workers", type=int, default=1)
+@click.option("-d", "--fixed-dt", type=float, default=None)
+@click.option("-s", "--substeps", type=int, default=1)
 @click.pass_context
-def run(ctx, interactive, config, trials, visualize):
+def run(ctx, interactive, config, trials, visualize, num_envs, workers, fixed_dt, substeps):
     ctx.forward(edenv_run.run)
 
+@main.command()
+@click.option("-e", "--environment", type=str, required=True)
+@click.option("-n", "--num-envs", type=int, default=1)
+@click.option("-d", "--fixed-dt", type=float, default=1 / 60)
+@click.option("-s", "--substeps", type=int, default=1)
+@click.option("-u", "--unix-socket", type=str, default=None)
+@click.option("--host", type=str, default="127.0.0.1")
+@click.option("--port", type=int, default=7070)
+@click.pass_context
+def serve(ctx, environment, num_envs, fixed_dt, substeps, unix_socket, host, port):
+    ctx.forward(edenv_server.serve)
+
 if __name__ == "__main__":
     main()
@@ -7,6 +7,7 @@ import os
 from pathlib import Path
 from tkinter import filedialog
 
+from tools.envedit.edenv_component import EComponent
 from tools.envedit.gui.gui_button import GUIButton
 from tools.envedit.gui.gui_component import GUIComponent
 from tools.envedit.gui.gui_dock_layout import GUIDockLayout
@@ -99,21 +100,21 @@ class ComponentDrawer(GUIFrame):
                 if property_type == PropertyType.INT:
                     property_val = GUINumberBox(use_int=True)
                     property_val.text_box.data = property
-                    property_val.text_box.set_text(self.component.property_vals[property])
+                    property_val.text_box.set_text(str(self.component.property_vals[property]))
                     property_val.text_box.on_text_changed = self.text_change_handler
                     self.property_fields[property] = property_val
                     property_layout.add_child(property_val)
                 elif property_type == PropertyType.FLOAT:
                     property_val = GUINumberBox()
                     property_val.text_box.data = property
-                    property_val.text_box.set_text(self.component.property_vals[property])
+                    property_val.text_box.set_text(str(self.component.property_vals[property]))
                     property_val.text_box.on_text_changed = self.text_change_handler
                     self.property_fields[property] = property_val
                     property_layout.add_child(property_val)
                 elif property_type == PropertyType.BOOL:
                     property_val = GUITextBox()
                     property_val.data = property
-                    property_val.set_text(self.component.property_vals[property])
+                    property_val.set_text(str(self.component.property_vals[property]))
                     property_val.on_text_changed = self.text_change_handler
                     self.property_fields[property] = property_val
                     property_layout.add_child(property_val)
@@ -248,12 +249,29 @@ class ComponentDrawer(GUIFrame):
     def set_envedit_data(self, data):
         self.envedit_data = data
 
-    # Handles the text change
-    def text_change_handler(self, text_box):
+    # Sets the property a text box edits from the text box's text
+    # Returns False if the text isn't a valid value for the property
+    def set_property_text(self, text_box):
         if isinstance(text_box.data, dict):
-            self.component.property_vals[text_box.data["parent"]][text_box.data["index"]] = text_box.text
+            property_name = text_box.data["parent"]
+            property_type = self.component.property_types[property_name]
+            try:
+                value = float(text_box.text) if property_type == PropertyType.VECTOR3 else text_box.text
+            except ValueError:
+                return False
+            self.component.property_vals[property_name][text_box.data["index"]] = value
         else:
-            self.component.property_vals[text_box.data] = text_box.text
+            property_type = self.component.property_types[text_box.data]
+            try:
+                self.component.property_vals[text_box.data] = EComponent.parse_value(property_type, text_box.text)
+            except ValueError:
+                return False
+        return True
+
+    # Handles the text change
+    def text_change_handler(self, text_box):
+        if not self.set_property_text(text_box):
+            return
         self.component.node.component_property_changed_selected()
         self.envedit_data.modify()
         self.envedit_data.update()
@@ -318,11 +336,11 @@ class ComponentDrawer(GUIFrame):
         property_val = self.property_fields[property_name]
 
         if property_type == PropertyType.INT:
-            property_val.text_box.set_text(self.component.property_vals[property_name])
+            property_val.text_box.set_text(str(self.component.property_vals[property_name]))
         elif property_type == PropertyType.FLOAT:
-            property_val.text_box.set_text(str(int(float(self.component.property_vals[property_name]) * 1000) / 1000))
+            property_val.text_box.set_text(str(int(self.component.property_vals[property_name] * 1000) / 1000))
         elif property_type == PropertyType.BOOL:
-            property_val.set_text(self.component.property_vals[property_name])
+            property_val.set_text(str(self.component.property_vals[property_name]))
         elif property_type == PropertyType.STRING:
             property_val.set_text(self.component.property_vals[property_name])
         elif property_type == PropertyType.FILE:
@@ -331,9 +349,10 @@ class ComponentDrawer(GUIFrame):
         elif property_type == PropertyType.ARRAY:
             property_val.set_text(self.component.property_vals[property_name])
         elif property_type == PropertyType.VECTOR3:
-            property_val.children[0].text_box.set_text(self.component.property_vals[property_name][0])
-            property_val.children[2].text_box.set_text(self.component.property_vals[property_name][1])
-            property_val.children[4].text_box.set_text(self.component.property_vals[property_name][2])
+            x, y, z = self.component.property_vals[property_name].tolist()
+            property_val.children[0].text_box.set_text(str(x))
+            property_val.children[2].text_box.set_text(str(y))
+            property_val.children[4].text_box.set_text(str(z))
 
     # Handles file property type being clicked
     def file_open_handler(self, text_box):
@@ -342,11 +361,7 @@ class ComponentDrawer(GUIFrame):
             file_path = Path(file_path)
             rel_path = file_path.relative_to(Path(os.getcwd()) / "resources")
             text_box.set_text(str(rel_path.parent / rel_path.stem))
-
-            if isinstance(text_box.data, dict):
-                self.component.property_vals[text_box.data["parent"]][text_box.data["index"]] = text_box.text
-            else:
-                self.component.property_vals[text_box.data] = text_box.text
+            self.set_property_text(text_box)
 
             self.component.node.component_property_changed_selected()
             self.envedit_data.modify()
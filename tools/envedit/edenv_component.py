@@ -7,13 +7,19 @@ Components are backed by a script that specifies its properties.
 import pkgutil
 from pathlib import Path
 import importlib
+
+import numpy as np
+
 from tools.envedit.property_type import PropertyType
 from tools.run.physics import Physics
 
 
 class EComponent:
+    __slots__ = ("name", "property_types", "property_vals", "node", "script_path", "physics", "trial", "event_bus",
+                 "component_update_callback")
     panda_root_node = None
     physics_world = None
+    shared_physics = Physics(None)      # Physics instance of the active physics world, shared by all components
     base = None
 
     def __init__(self, name="", property_types={}):
@@ -22,11 +28,12 @@ class EComponent:
         self.property_vals = {}
         self.node = None
         self.script_path = None
-        self.physics = Physics(EComponent.physics_world)
+        self.physics = EComponent.shared_physics
         self.trial = None
+        self.event_bus = None
         self.component_update_callback = None       # Called when component modifies
 
-    # Returns the default value of the field type
+    # Returns the serialized default value of the field type
     @staticmethod
     def get_default_value(property_type):
         if property_type == PropertyType.INT:
@@ -46,11 +53,45 @@ class EComponent:
         elif property_type == PropertyType.NODE:
             return "0000000000000000"
 
+    # Converts a serialized property value to the native value of the field type
+    # INT, FLOAT and BOOL values become int, float and bool, and VECTOR3 values become float arrays
+    @staticmethod
+    def parse_value(property_type, value):
+        if property_type == PropertyType.INT:
+            return int(float(value))
+        elif property_type == PropertyType.FLOAT:
+            return float(value)
+        elif property_type == PropertyType.BOOL:
+            return value if isinstance(value, bool) else str(value).lower() == "true"
+        elif property_type == PropertyType.ARRAY:
+            return list(value)
+        elif property_type == PropertyType.VECTOR3:
+            return np.array([float(element) for element in value])
+        return value
+
+    # Converts a native property value to its serialized form
+    @staticmethod
+    def format_value(property_type, value):
+        if property_type in (PropertyType.INT, PropertyType.FLOAT, PropertyType.BOOL):
+            return str(value)
+        elif property_type == PropertyType.ARRAY:
+            return list(value)
+        elif property_type == PropertyType.VECTOR3:
+            return [str(element) for element in value.tolist()]
+        return value
+
+    # Returns a copy of property values, where arrays and lists are copied too
+    @staticmethod
+    def copy_values(property_vals):
+        return {property: value.copy() if isinstance(value, (list, np.ndarray)) else value
+                for property, value in property_vals.items()}
+
     # Returns a dictionary with the values of the component
     def to_dict(self):
         component_dict = {}
         component_dict["script_path"] = self.script_path
-        component_dict["values"] = self.property_vals
+        component_dict["values"] = {property: EComponent.format_value(self.property_types.get(property), value)
+                                    for property, value in self.property_vals.items()}
         return component_dict
 
     # Called when component must change and node isn't selected
@@ -69,13 +110,24 @@ class EComponent:
     def on_gui_remove(self):
         pass
 
+    # Called when the component's node is removed from the scene graph
+    # Unregisters the component from its event bus and removes the rigid bodies of its node from the physics world,
+    # so removed nodes stop receiving events and colliding
+    # Subclasses that override this should call EComponent.on_remove
+    def on_remove(self):
+        if self.event_bus is not None:
+            self.event_bus.unregister(self)
+        if self.node is not None:
+            self.physics.remove_node_bodies(self.node.transform)
+
     # Called at the beginning of the trial
     def start(self):
         pass
 
     # Returns the component from a script path
+    # If "property_vals" is given, the component uses it instead of default values
     @staticmethod
-    def from_script(script_path):
+    def from_script(script_path, property_vals=None):
         module_name = script_path.split(".")[-1].title()
         module_name = module_name.replace("_", "")
 
@@ -91,21 +143,23 @@ class EComponent:
             # Set properties of new component
             new_component.name = module_name
             new_component.property_types = component_class.get_properties()
+            if property_vals is not None:
+                new_component.property_vals = property_vals
+                return new_component
             new_component.property_vals = {}
             for property in new_component.property_types:
-                new_component.property_vals[property] = EComponent.get_default_value(new_component.property_types[property])
+                property_type = new_component.property_types[property]
+                new_component.property_vals[property] = EComponent.parse_value(property_type, EComponent.get_default_value(property_type))
             return new_component
 
         raise Exception(f"No module \"{script_path}\" exists")
 
     # Creates a new component from a dictionary
+    # Values are parsed once here, so components can use them without converting them again
     @staticmethod
     def load_from_dict(component_dict):
         new_component = EComponent.from_script(component_dict["script_path"])
-        new_component.property_vals = component_dict["values"]
-        property_types = new_component.get_properties()
-        for property in property_types:
-            if property not in new_component.property_vals:
-                property_val = EComponent.get_default_value(property_types[property])
-                new_component.property_vals[property] = property_val
+        property_types = new_component.property_types
+        for property, value in component_dict["values"].items():
+            new_component.property_vals[property] = EComponent.parse_value(property_types.get(property), value)
         return new_component
@@ -144,11 +144,10 @@ class EnvEdit(ShowBase):
         self.update_node(self.envedit_data.scene_root)
         return Task.cont
 
-    # Recursive function to update nodes
+    # Updates a node and its children
     def update_node(self, node):
-        node.component_gui_update()
-        for child in node.children:
-            self.update_node(child)
+        for curr_node in node.get_subtree():
+            curr_node.component_gui_update()
 
     def handle_new(self):
         # Reset the scene root
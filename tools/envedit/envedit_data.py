@@ -60,12 +60,10 @@ class EnveditData:
         self.dirty = False
         self.update()
 
-    # Recursive function to update all components after graph is loaded
+    # Updates all components after graph is loaded, children first
     def init_node_components(self, node):
-        for child in node.children:
-            self.init_node_components(child)
-
-        node.component_property_changed()
+        for curr_node in node.get_subtree_post_order():
+            curr_node.component_property_changed()
 
     # Sets the target node
     def set_target_node(self, node):
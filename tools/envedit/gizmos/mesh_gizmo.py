@@ -3,6 +3,8 @@ A selectable mesh.
 
 @author Ben Giacalone
 """
+import json
+from collections import OrderedDict
 from os import path
 from pathlib import Path
 import random
@@ -19,6 +21,8 @@ from tools.envedit.gizmos.gizmo import Gizmo
 
 
 class MeshGizmo(Gizmo):
+    MAX_CACHED_GEOMS = 64
+    geom_cache = OrderedDict()      # Maps mesh names to (modification time, geometry), least recently used first
 
     def __init__(self, mesh_json=None, object_id=0):
         Gizmo.__init__(self)
@@ -34,7 +38,7 @@ class MeshGizmo(Gizmo):
 
     # Sets the world matrix of the selectable object
     def set_world_matrix(self, matrix):
-        self.matrix = matrix
+        self.matrix = matrix.copy()
         panda_mat = LMatrix4f(matrix[0][0], matrix[1][0], matrix[2][0], matrix[3][0],
                               matrix[0][1], matrix[1][1], matrix[2][1], matrix[3][1],
                               matrix[0][2], matrix[1][2], matrix[2][2], matrix[3][2],
@@ -56,6 +60,36 @@ class MeshGizmo(Gizmo):
 
     # Generates geometry node from JSON
     def gen_geom(self, mesh_json):
+        self.set_geom(*MeshGizmo.build_geom(mesh_json))
+
+    # Returns the geometry of a mesh in the resources folder, or None if it doesn't exist
+    # Geometry is only built the first time a mesh is used, and again if its file changes, so gizmos of the same mesh
+    # share geometry
+    # The geometry of a changed file replaces the old geometry, and the least recently used meshes are dropped once
+    # more than MAX_CACHED_GEOMS are cached
+    @staticmethod
+    def get_mesh_geom(mesh_name):
+        mesh_path = Path("resources") / (mesh_name + ".json")
+        if not mesh_path.exists():
+            MeshGizmo.geom_cache.pop(mesh_name, None)
+            return None
+        modified_time = mesh_path.stat().st_mtime
+        if mesh_name in MeshGizmo.geom_cache and MeshGizmo.geom_cache[mesh_name][0] == modified_time:
+            MeshGizmo.geom_cache.move_to_end(mesh_name)
+            return MeshGizmo.geom_cache[mesh_name][1]
+
+        with open(mesh_path, "r") as file:
+            geom = MeshGizmo.build_geom(json.load(file))
+        MeshGizmo.geom_cache[mesh_name] = (modified_time, geom)
+        MeshGizmo.geom_cache.move_to_end(mesh_name)
+        if len(MeshGizmo.geom_cache) > MeshGizmo.MAX_CACHED_GEOMS:
+            MeshGizmo.geom_cache.popitem(last=False)
+        return geom
+
+    # Builds geometry from JSON
+    # Returns the geom, the render state holding its texture (or None) and whether it has joint weights
+    @staticmethod
+    def build_geom(mesh_json):
         # Create vertex format
         geom_array = GeomVertexArrayFormat()
         geom_array.add_column("vertex", 3, Geom.NTFloat32, Geom.CPoint)
@@ -119,19 +153,23 @@ class MeshGizmo(Gizmo):
         geom.add_primitive(prim)
 
         # Load texture
-        tex = None
+        state = None
         if "texture" in mesh_json:
             tex = Loader(EComponent.base).loadTexture((Path("resources") / mesh_json["texture"]).absolute())
             tex.setMagfilter(SamplerState.FT_nearest)
             tex.setMinfilter(SamplerState.FT_nearest)
+            state = RenderState.make(TextureAttrib.make(tex))
 
+        return geom, state, has_weights
+
+    # Creates the geometry node of the gizmo
+    # The geom and render state aren't copied, so they can be shared with other gizmos
+    def set_geom(self, geom, state, has_weights):
         # Create new geometry node
         geom_node = GeomNode(str(random.randint(0, 255)) + "_node")
-        if tex is None:
+        if state is None:
             geom_node.addGeom(geom)
         else:
-            attrib = TextureAttrib.make(tex)
-            state = RenderState.make(attrib)
             geom_node.addGeom(geom, state)
         if EComponent.panda_root_node is not None:
             self.geom_path = EComponent.panda_root_node.attach_new_node(geom_node)
@@ -67,7 +67,7 @@ class ScaleHandleGizmo(MeshGizmo):
                                                                 self.plane_normal)
         self.start_mouse_axis_pos = (self.handle_dir.dot(start_mouse_world_pos - node_world_pos) / self.handle_dir.dot(
             self.handle_dir)) * self.handle_dir
-        self.start_scale = self.component.node.transform.get_world_scale()
+        self.start_scale = self.component.node.transform.get_world_scale().copy()
 
         # Tell gizmo to start dragging
         GizmoSystem.set_drag(self)
@@ -72,7 +72,7 @@ class TranslateArrowGizmo(MeshGizmo):
         self.start_mouse_world_pos = self.get_ray_plane_intersection(view_mouse_pos,
                                                                      self.component.node.transform.get_world_translation(),
                                                                      self.plane_normal)
-        self.start_pos = self.component.node.transform.get_world_translation()
+        self.start_pos = self.component.node.transform.get_world_translation().copy()
 
         # Tell gizmo to start dragging
         GizmoSystem.set_drag(self)
@@ -3,18 +3,22 @@ Represents a graph node for EDEnv's internal scene graph representation.
 
 @author Ben Giacalone
 """
-import math
-import random
+import secrets
 import string
 
 import numpy as np
 
 from tools.envedit.edenv_component import EComponent
 from tools.envedit.property_type import PropertyType
+from tools.envedit.scene_snapshot import SceneSnapshot
 from tools.envedit.transform import Transform
 
 
 class GraphNode:
+    __slots__ = ("transform", "children", "parent", "data", "use_gui", "name", "node_index", "id", "pressed_callback")
+    ID_CHARS = np.array(list(string.digits + string.ascii_lowercase))
+    ID_POOL_SIZE = 1024
+    id_pool = []        # IDs generated ahead of time, so most calls to gen_id only pop from a list
 
     def __init__(self, name="", data=[], use_gui=True, id=None):
         self.transform = Transform()
@@ -26,29 +30,32 @@ class GraphNode:
         for component in data:
             component.node = self
         self.name = name
-        if id is None:
-            self.id = GraphNode.gen_id()
+        self.node_index = None      # Lookup index of the scene graph, only kept by the root
+        self.pressed_callback = None    # Set by the graph viewer
+        self.id = GraphNode.gen_id() if id is None else id
 
     # Adds a child node to this node.
     def add_child(self, node):
         node.parent = self
-        node.transform.set_parent_matrix(self.transform.get_world_matrix())
+        node.node_index = None
         self.children.append(node)
+        node.transform.set_parent(self.transform)
+        self.invalidate_index()
 
     # Removes a child from this node.
+    # Components of the removed nodes are unregistered from the event system, and their rigid bodies are removed
     def remove_child(self, node):
-        # Propegate to children
-        for child in node.children:
-            node.remove_child(child)
-
-        # Remove all components of the removed node
-        for component in node.data:
-            component.on_gui_remove()
+        # Remove all components of the removed node and its children, children first
+        for removed_node in node.get_subtree_post_order():
+            for component in removed_node.data:
+                component.on_gui_remove()
+                component.on_remove()
 
         # Remove node
         node.parent = None
-        node.transform.set_parent_matrix(np.identity(4))
         self.children.remove(node)
+        node.transform.set_parent_matrix(np.identity(4))
+        self.invalidate_index()
 
     # Adds a component to the node
     def add_component(self, component):
@@ -96,118 +103,217 @@ class GraphNode:
         for component in self.data:
             component.start()
 
+    # Sets the name of the node
+    def set_name(self, name):
+        self.name = name
+        self.invalidate_index()
+
+    # Returns the root of the scene graph the node is in
+    def get_root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    # Returns the lookup index of the scene graph the node is in, building it if it is out of date
+    def get_index(self):
+        root = self.get_root()
+        if root.node_index is None:
+            root.node_index = NodeIndex(root)
+        return root.node_index
+
+    # Marks the lookup index of the scene graph the node is in as out of date
+    def invalidate_index(self):
+        self.get_root().node_index = None
+
+    # Returns this node and its children in depth first order
+    # The order is cached by the scene graph until its structure changes
+    def get_subtree(self):
+        index = self.get_index()
+        start, end = index.subtree_ranges[self]
+        return index.nodes[start:end]
+
+    # Returns this node and its children, with every node coming after its children
+    def get_subtree_post_order(self):
+        nodes = []
+        stack = [(self, False)]
+        while len(stack) > 0:
+            node, finished = stack.pop()
+            if finished:
+                nodes.append(node)
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+        return nodes
+
+    # Captures the state of this node and its children, so it can be restored later
+    def snapshot(self):
+        return SceneSnapshot(self)
+
     # Finds a child node in the graph
     def find_child(self, node):
-        if self is node:
-            return self
-        for child in self.children:
-            result = child.find_child(node)
-            if result is not None:
-                return result
+        curr_node = node
+        while curr_node is not None:
+            if curr_node is self:
+                return node
+            curr_node = curr_node.parent
         return None
 
     # Finds a child node in the graph by name
     def find_child_by_name(self, name):
-        if self.name == name:
-            return self
-        for child in self.children:
-            result = child.find_child_by_name(name)
-            if result is not None:
-                return result
-        return None
+        index = self.get_index()
+        return self.find_first_child(index, index.nodes_by_name.get(name, []))
 
     # Finds a child node in the graph by ID
     def find_child_by_id(self, id):
-        if self.id == id:
-            return self
-        for child in self.children:
-            result = child.find_child_by_id(id)
-            if result is not None:
-                return result
+        index = self.get_index()
+        return self.find_first_child(index, index.nodes_by_id.get(id, []))
+
+    # Returns the first node of a list in depth first order that is this node or one of its children
+    def find_first_child(self, index, nodes):
+        start, end = index.subtree_ranges[self]
+        for node in nodes:
+            if start <= index.subtree_ranges[node][0] < end:
+                return node
         return None
 
     # Handles a matrix update
-    def on_matrix_update(self, matrix):
-        for child in self.children:
-            child.transform.set_parent_matrix(matrix)
-            if self.use_gui:
-                child.component_property_changed()
+    # World matrices of children are recalculated when read, so only the editor needs to be told about the change
+    def on_matrix_update(self):
+        if self.use_gui:
+            for node in self.get_subtree_post_order()[:-1]:
+                node.component_property_changed()
 
     # Processes the scene graph and returns a dict representation
     @staticmethod
     def scene_graph_to_dict(node):
-        curr_dict = {}
-        curr_dict["name"] = node.name
-        curr_dict["id"] = node.id
-        curr_dict["components"] = [component.to_dict() for component in node.data if component.to_dict()["script_path"] != "components.position"]
-        curr_dict["transform"] = node.transform.to_dict()
-
-        child_list = []
-        for child in node.children:
-            child_list.append(GraphNode.scene_graph_to_dict(child))
-
-        curr_dict["children"] = child_list
-        return curr_dict
+        root_dict = None
+
+        # Entries are (node, list of the parent's child dicts)
+        stack = [(node, None)]
+        while len(stack) > 0:
+            curr_node, parent_list = stack.pop()
+            curr_dict = {}
+            curr_dict["name"] = curr_node.name
+            curr_dict["id"] = curr_node.id
+            curr_dict["components"] = [component.to_dict() for component in curr_node.data if component.to_dict()["script_path"] != "components.position"]
+            curr_dict["transform"] = curr_node.transform.to_dict()
+            curr_dict["children"] = []
+
+            if parent_list is None:
+                root_dict = curr_dict
+            else:
+                parent_list.append(curr_dict)
+            stack.extend((child, curr_dict["children"]) for child in reversed(curr_node.children))
+
+        return root_dict
 
     # Processes the file dictionary and returns the corresponding graph node
     @staticmethod
     def dict_to_scene_graph(node_dict, use_gui=True):
-        node = GraphNode()
-        node.name = node_dict["name"]
-        node.id = node_dict["id"]
-        node.data = []
-        node.use_gui = use_gui
+        root = None
+
+        # Entries are (node dict, parent node)
+        stack = [(node_dict, None)]
+        while len(stack) > 0:
+            node_dict, parent = stack.pop()
+            node = GraphNode.dict_to_node(node_dict, use_gui)
+            if parent is None:
+                root = node
+            else:
+                parent.add_child(node)
+            stack.extend((child, node) for child in reversed(node_dict["children"]))
+
+        return root
+
+    # Processes the file dictionary of a single node, without its children
+    @staticmethod
+    def dict_to_node(node_dict, use_gui=True):
+        node = GraphNode(node_dict["name"], [], use_gui, node_dict["id"])
         node.transform.load_from_dict(node_dict["transform"])
-
-        pos_component = EComponent.from_script("components.position")
-        pos_component.property_vals["pos"][0] = str(int(node.transform.trans[0].item() * 1000) / 1000)
-        pos_component.property_vals["pos"][1] = str(int(node.transform.trans[1].item() * 1000) / 1000)
-        pos_component.property_vals["pos"][2] = str(int(node.transform.trans[2].item() * 1000) / 1000)
-        pos_component.property_vals["rot"][0] = str(math.degrees(int(node.transform.rot[0].item() * 1000) / 1000))
-        pos_component.property_vals["rot"][1] = str(math.degrees(int(node.transform.rot[1].item() * 1000) / 1000))
-        pos_component.property_vals["rot"][2] = str(math.degrees(int(node.transform.rot[2].item() * 1000) / 1000))
-        pos_component.property_vals["scale"][0] = str(int(node.transform.scale[0].item() * 1000) / 1000)
-        pos_component.property_vals["scale"][1] = str(int(node.transform.scale[1].item() * 1000) / 1000)
-        pos_component.property_vals["scale"][2] = str(int(node.transform.scale[2].item() * 1000) / 1000)
-        node.add_component(pos_component)
+        node.add_component(GraphNode.create_position_component(node.transform))
 
         for component_dict in node_dict["components"]:
             component = EComponent.load_from_dict(component_dict)
             node.add_component(component)
 
-        for child in node_dict["children"]:
-            node.add_child(GraphNode.dict_to_scene_graph(child, use_gui))
-
         return node
 
+    # Returns a position component that displays a transform
+    # Displayed values are truncated to 3 decimal places
+    @staticmethod
+    def create_position_component(transform):
+        pos_component = EComponent.from_script("components.position")
+        pos_component.property_vals["pos"][:] = np.trunc(transform.trans * 1000) / 1000
+        pos_component.property_vals["rot"][:] = np.degrees(np.trunc(transform.rot * 1000) / 1000)
+        pos_component.property_vals["scale"][:] = np.trunc(transform.scale * 1000) / 1000
+        return pos_component
+
     # Generates an ID
     # An ID consists of 16 alphanumeric characters
     @staticmethod
     def gen_id():
-        char_set = string.digits + string.ascii_lowercase
-        new_id = "".join(random.choice(char_set) for _ in range(16))
-        return new_id
+        if len(GraphNode.id_pool) == 0:
+            GraphNode.id_pool = GraphNode.gen_ids(GraphNode.ID_POOL_SIZE)
+        return GraphNode.id_pool.pop()
+
+    # Generates a list of IDs at once
+    # Characters are drawn from secure random bytes, dropping the bytes that would favor some characters over others
+    @staticmethod
+    def gen_ids(count):
+        num_chars = len(GraphNode.ID_CHARS)
+        usable_bytes = 256 - 256 % num_chars
+        char_indices = np.empty(0, dtype=np.uint8)
+        while len(char_indices) < count * 16:
+            random_bytes = np.frombuffer(secrets.token_bytes(count * 16 * 2), dtype=np.uint8)
+            char_indices = np.concatenate([char_indices, random_bytes[random_bytes < usable_bytes] % num_chars])
+        chars = GraphNode.ID_CHARS[char_indices[:count * 16]]
+        return chars.view("<U16").tolist()
 
     # Replaces all the ID's in a scene graph and returns a conversion dict
     @staticmethod
     def replace_id(node):
-        new_id = GraphNode.gen_id()
-        old_id = node.id
-        conv_dict = {old_id: new_id}
-
-        node.id = new_id
-        for child in node.children:
-            conv_dict.update(GraphNode.replace_id(child))
+        nodes = node.get_subtree()
+        new_ids = GraphNode.gen_ids(len(nodes))
+        conv_dict = {curr_node.id: new_id for curr_node, new_id in zip(nodes, new_ids)}
+        for curr_node, new_id in zip(nodes, new_ids):
+            curr_node.id = new_id
+        node.invalidate_index()
 
         return conv_dict
 
     # Replaces all the "NODE" properties in a scene graph using a conversion dict
     @staticmethod
     def replace_node_props(node, conv_dict):
-        for component in node.data:
-            for property in component.property_vals:
-                if component.property_types[property] == PropertyType.NODE:
-                    component.property_vals[property] = conv_dict[component.property_vals[property]]
-
-        for child in node.children:
-            GraphNode.replace_node_props(child, conv_dict)
+        for curr_node in node.get_subtree():
+            for component in curr_node.data:
+                for property in component.property_vals:
+                    if component.property_types[property] == PropertyType.NODE:
+                        component.property_vals[property] = conv_dict[component.property_vals[property]]
+
+
+# Maps the IDs and names of the nodes in a scene graph to the nodes, in depth first order
+class NodeIndex:
+    __slots__ = ("nodes", "nodes_by_id", "nodes_by_name", "subtree_ranges")
+
+    def __init__(self, root):
+        self.nodes = []                 # Nodes in depth first order
+        self.nodes_by_id = {}
+        self.nodes_by_name = {}
+        self.subtree_ranges = {}    # Maps nodes to the range of depth first positions of their subtrees
+
+        # Entries are (node, False) when a node is entered and (node, True) when its subtree is finished
+        stack = [(root, False)]
+        position = 0
+        while len(stack) > 0:
+            node, finished = stack.pop()
+            if finished:
+                self.subtree_ranges[node] = (self.subtree_ranges[node], position)
+                continue
+            self.nodes.append(node)
+            self.nodes_by_id.setdefault(node.id, []).append(node)
+            self.nodes_by_name.setdefault(node.name, []).append(node)
+            self.subtree_ranges[node] = position
+            position += 1
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
@@ -18,6 +18,7 @@ from tools.envedit.gui.gui_scroll_container import GUIScrollContainer
 from tools.envedit.gui.gui_stack_layout import GUIStackLayout
 from tools.envedit.gui.gui_system import GUISystem
 from tools.envedit.gui.gui_text_box import GUITextBox
+from tools.envedit.prefab import Prefab
 from tkinter import filedialog
 
 
@@ -186,9 +187,7 @@ class GraphViewer(GUIFrame):
     def add_node_handler(self, item):
         # Create new node
         pos_comp = EComponent.from_script("components.position")
-        pos_comp.property_vals["scale"][0] = "1"
-        pos_comp.property_vals["scale"][1] = "1"
-        pos_comp.property_vals["scale"][2] = "1"
+        pos_comp.property_vals["scale"][:] = 1
         new_node = GraphNode(f"New Node ({len(item.data.sub_list)})", [pos_comp])
         item.data.data.add_child(new_node)
         new_node.component_property_changed()
@@ -240,18 +239,12 @@ class GraphViewer(GUIFrame):
 
         # Open graph node
         if file_path != "":
-            with open(file_path, "r") as file:
-                # Import sub tree
-                file_json = json.load(file)
-                imported_node = GraphNode.dict_to_scene_graph(file_json)
+            # Import sub tree as a prefab, which gives it new IDs and replaces NODE properties to proper ones
+            imported_node = Prefab.load(file_path).instantiate()
 
-                # Replace NODE property to proper ones
-                conv_dict = GraphNode.replace_id(imported_node)
-                GraphNode.replace_node_props(imported_node, conv_dict)
-
-                # Add sub tree to graph
-                item.data.data.add_child(imported_node)
-                self.envedit_data.update()
+            # Add sub tree to graph
+            item.data.data.add_child(imported_node)
+            self.envedit_data.update()
 
     # Handles losing focus of renaming text box
     def rename_lost_focus(self, item):
@@ -260,7 +253,7 @@ class GraphViewer(GUIFrame):
             self.envedit_data.modify()
 
         # Replace textbox with list label
-        item.data.data.name = item.text
+        item.data.data.set_name(item.text)
         label = GUILabel()
         label.text_size = 12
         label.receive_events = False
@@ -0,0 +1,96 @@
+"""
+Represents a prefab, a scene graph template that is parsed once and can be instantiated many times.
+
+@author Ben Giacalone
+"""
+import json
+import os
+from collections import OrderedDict
+
+from tools.envedit.edenv_component import EComponent
+from tools.envedit.graph_node import GraphNode
+from tools.envedit.property_type import PropertyType
+from tools.envedit.transform import Transform
+
+
+class Prefab:
+    MAX_CACHED = 32
+    cache = OrderedDict()       # Maps prefab file paths to (modification time, prefab), least recently used first
+
+    # Builds the template from the dict representation of a scene graph
+    # The template is never modified, instances get their own copies of its values
+    def __init__(self, node_dict):
+        self.names = []
+        self.ids = []
+        self.parents = []           # Index of the parent of each node, or -1 for the root
+        self.transforms = []        # Transform dict of each node
+        self.components = []        # List of (script path, property values, NODE properties) of each node's components
+
+        # Flatten the scene graph in depth first order, so parents are always created before their children
+        stack = [(node_dict, -1)]
+        while len(stack) > 0:
+            curr_dict, parent = stack.pop()
+            index = len(self.ids)
+            self.names.append(curr_dict["name"])
+            self.ids.append(curr_dict["id"])
+            self.parents.append(parent)
+            self.transforms.append(curr_dict["transform"])
+
+            # The position component only depends on the transform, so it is part of the template too
+            transform = Transform()
+            transform.load_from_dict(curr_dict["transform"])
+            components = [Prefab.parse_component(GraphNode.create_position_component(transform))]
+            components += [Prefab.parse_component(EComponent.load_from_dict(component_dict))
+                           for component_dict in curr_dict["components"]]
+            self.components.append(components)
+            stack.extend((child, index) for child in reversed(curr_dict["children"]))
+
+    # Returns the script path, property values and NODE property names of a component
+    @staticmethod
+    def parse_component(component):
+        node_props = [property for property, property_type in component.property_types.items()
+                      if property_type == PropertyType.NODE and property in component.property_vals]
+        return component.script_path, component.property_vals, node_props
+
+    # Creates a new scene graph from the template and returns its root
+    # If "new_ids" is True, nodes get new IDs, and NODE properties pointing inside the prefab are changed to match
+    # NODE properties pointing outside of the prefab are kept as they are
+    def instantiate(self, use_gui=True, new_ids=True):
+        ids = GraphNode.gen_ids(len(self.ids)) if new_ids else self.ids
+        conv_dict = dict(zip(self.ids, ids))
+
+        nodes = []
+        for i in range(len(self.ids)):
+            node = GraphNode(self.names[i], [], use_gui, ids[i])
+            node.transform.load_from_dict(self.transforms[i])
+
+            for script_path, property_vals, node_props in self.components[i]:
+                component = EComponent.from_script(script_path, EComponent.copy_values(property_vals))
+                for property in node_props:
+                    old_id = component.property_vals[property]
+                    component.property_vals[property] = conv_dict.get(old_id, old_id)
+                node.add_component(component)
+
+            if self.parents[i] >= 0:
+                nodes[self.parents[i]].add_child(node)
+            nodes.append(node)
+
+        return nodes[0]
+
+    # Returns the prefab stored in a JSON file
+    # Prefabs are cached until their file changes
+    @staticmethod
+    def load(file_path):
+        file_path = os.path.abspath(file_path)
+        modified_time = os.path.getmtime(file_path)
+        if file_path in Prefab.cache and Prefab.cache[file_path][0] == modified_time:
+            Prefab.cache.move_to_end(file_path)
+            return Prefab.cache[file_path][1]
+
+        with open(file_path, "r") as file:
+            prefab = Prefab(json.load(file))
+        Prefab.cache[file_path] = (modified_time, prefab)
+        Prefab.cache.move_to_end(file_path)
+        if len(Prefab.cache) > Prefab.MAX_CACHED:
+            Prefab.cache.popitem(last=False)
+        return prefab
@@ -0,0 +1,88 @@
+"""
+Stores the state of a scene graph, so it can be restored without rebuilding the scene graph or its components.
+
+@author Ben Giacalone
+"""
+import copy
+
+import numpy as np
+
+from tools.envedit.edenv_component import EComponent
+
+
+class SceneSnapshot:
+
+    # Captures the structure, transforms and component values of "root" and its children
+    def __init__(self, root):
+        self.root = root
+        self.root_parent_matrix = root.transform.parent_matrix.copy()
+
+        # Structure
+        self.nodes = root.get_subtree()
+        self.names = [node.name for node in self.nodes]
+        self.ids = [node.id for node in self.nodes]
+        self.parents = [node.parent for node in self.nodes]
+        self.children = [list(node.children) for node in self.nodes]
+        self.transform_children = [list(node.transform.children) for node in self.nodes]
+        self.node_components = [list(node.data) for node in self.nodes]
+
+        # Transform properties, one row per node
+        self.trans = np.array([node.transform.trans for node in self.nodes])
+        self.rot = np.array([node.transform.rot for node in self.nodes])
+        self.scale = np.array([node.transform.scale for node in self.nodes])
+
+        # Property values and attributes of every component
+        self.components = [component for node in self.nodes for component in node.data]
+        self.property_vals = [EComponent.copy_values(component.property_vals) for component in self.components]
+        self.attributes = [SceneSnapshot.copy_attributes(getattr(component, "__dict__", None)) for component in self.components]
+
+    # Returns a copy of a component's attribute dict, where lists, dicts, sets and arrays are copied too
+    @staticmethod
+    def copy_attributes(attributes):
+        if attributes is None:
+            return None
+        return {name: copy.copy(value) if isinstance(value, (list, dict, set, np.ndarray)) else value
+                for name, value in attributes.items()}
+
+    # Restores the scene graph to the captured state
+    # Nodes and components are reused, so components only need to be started again
+    def restore(self):
+        # Undo nodes being added, removed or moved
+        structure_changed = False
+        for i, node in enumerate(self.nodes):
+            node.name = self.names[i]
+            node.id = self.ids[i]
+            node.parent = self.parents[i]
+            if node.children != self.children[i] or node.transform.children != self.transform_children[i]:
+                node.children = list(self.children[i])
+                node.transform.children = list(self.transform_children[i])
+                for child in node.children:
+                    child.transform.parent = node.transform
+                structure_changed = True
+            if node.data != self.node_components[i]:
+                node.data = list(self.node_components[i])
+                for component in node.data:
+                    component.node = node
+        self.root.invalidate_index()
+        self.root.transform.parent_matrix[:] = self.root_parent_matrix
+        if structure_changed and self.root.transform.store is not None:
+            self.root.transform.store.invalidate_structure()
+
+        # Restore transforms
+        # Relinking may leave an up to date transform under an out of date one, so world matrices are invalidated
+        # from the root down
+        for node in self.nodes:
+            node.transform.world_dirty = False
+        for node, trans, rot, scale in zip(self.nodes, self.trans, self.rot, self.scale):
+            transform = node.transform
+            transform.trans[:] = trans
+            transform.rot[:] = rot
+            transform.scale[:] = scale
+            transform.update()
+
+        # Restore components
+        for component, property_vals, attributes in zip(self.components, self.property_vals, self.attributes):
+            component.property_vals = EComponent.copy_values(property_vals)
+            if attributes is not None:
+                component.__dict__.clear()
+                component.__dict__.update(SceneSnapshot.copy_attributes(attributes))
@@ -8,50 +8,78 @@ from math import cos, sin, atan2, sqrt
 
 
 class Transform:
+    __slots__ = ("local_matrix", "parent_matrix", "world_matrix", "dirty", "world_dirty", "parent", "children", "trans",
+                 "rot", "scale", "world_rot", "world_scale", "world_decomposed", "on_matrix_update", "store", "index")
 
     def __init__(self):
         self.local_matrix = np.identity(4)
-        self.parent_matrix = np.identity(4)
-        self.dirty = False
-        self.trans = np.array([0, 0, 0])
-        self.rot = np.array([0, 0, 0])
-        self.scale = np.array([1, 1, 1])
+        self.parent_matrix = np.identity(4)     # Used if the transform has no parent transform
+        self.world_matrix = np.identity(4)
+        self.dirty = False                      # If the local matrix is out of date
+        self.world_dirty = False                # If the world matrix is out of date
+        self.parent = None
+        self.children = []
+        self.trans = np.zeros(3)
+        self.rot = np.zeros(3)
+        self.scale = np.ones(3)
+        self.world_rot = np.zeros(3)
+        self.world_scale = np.ones(3)
+        self.world_decomposed = True            # If world_rot and world_scale match the world matrix
         self.on_matrix_update = None  # Callback is called when transform is changed
+        self.store = None               # TransformStore holding the transform's properties and matrices, if any
+        self.index = None               # Index of the transform in its TransformStore
 
-    # Sets the parent matrix of the transform
+    # Sets the parent matrix of the transform, detaching it from its parent transform
     def set_parent_matrix(self, matrix):
-        self.parent_matrix = matrix
+        self.detach()
+        self.parent_matrix[:] = matrix
         self.update()
 
+    # Sets the parent transform of the transform
+    # The world matrix of the parent is used as the parent matrix, and is only read when needed
+    def set_parent(self, parent):
+        self.detach()
+        self.parent = parent
+        parent.children.append(self)
+        if parent.store is not None:
+            parent.store.invalidate_structure()
+        self.update()
+
+    # Removes the transform from its parent transform's children
+    def detach(self):
+        if self.store is not None:
+            self.store.invalidate_structure()
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            self.parent = None
+
+    # Returns a copy of the parent matrix of the transform
+    def get_parent_matrix(self):
+        return self.get_parent_matrix_view().copy()
+
+    # Returns the parent matrix of the transform without copying it
+    # The returned matrix is reused, and changes when the transform's parents change
+    def get_parent_matrix_view(self):
+        if self.store is not None:
+            return self.store.get_parent_matrix(self)
+        if self.parent is not None:
+            return self.parent.get_world_matrix_view()
+        return self.parent_matrix
+
     # Sets the world matrix of the transform
     def set_world_matrix(self, matrix):
-        self.set_matrix(np.linalg.inv(self.parent_matrix).dot(matrix))
+        self.set_matrix(np.linalg.inv(self.get_parent_matrix_view()).dot(matrix))
         self.update()
 
     # Sets the local matrix of the transform and sets its transform properties
     def set_matrix(self, matrix):
-        self.local_matrix = matrix
-        temp_mat = self.local_matrix.copy()
-
-        # Get translation
-        self.trans = np.array([temp_mat[0][3], temp_mat[1][3], temp_mat[2][3]])
-        temp_mat[0][3] = 0
-        temp_mat[1][3] = 0
-        temp_mat[2][3] = 0
-
-        # Get scale
-        self.scale = np.array([np.linalg.norm(np.array([temp_mat[0][0], temp_mat[1][0], temp_mat[2][0]])),
-                               np.linalg.norm(np.array([temp_mat[0][1], temp_mat[1][1], temp_mat[2][1]])),
-                               np.linalg.norm(np.array([temp_mat[0][2], temp_mat[1][2], temp_mat[2][2]]))])
-
-        # Get rotation
-        temp_mat = temp_mat.dot(np.array([[1 / self.scale[0], 0, 0, 0],
-                                          [0, 1 / self.scale[1], 0, 0],
-                                          [0, 0, 1 / self.scale[2], 0],
-                                          [0, 0, 0, 1]]))
-        self.rot = np.array([atan2(temp_mat[2][1], temp_mat[2][2]),
-                             atan2(-temp_mat[2][0], sqrt(pow(temp_mat[2][1], 2) + pow(temp_mat[2][2], 2))),
-                             atan2(temp_mat[1][0], temp_mat[0][0])])
+        decompose_matrix(matrix, self.trans, self.rot, self.scale)
+        if self.store is not None:
+            self.store.write_properties(self)
+        else:
+            self.local_matrix[:] = matrix
+            self.dirty = False
+            self.invalidate_world()
 
     # Returns the translation matrix of the translation vector
     def get_trans_mat(self, trans):
@@ -62,19 +90,9 @@ class Transform:
 
     # Returns the rotation matrix of the euler rotation vector
     def get_rot_mat(self, rot):
-        x_rot_mat = np.array([[1, 0, 0, 0],
-                              [0, cos(rot[0]), -sin(rot[0]), 0],
-                              [0, sin(rot[0]), cos(rot[0]), 0],
-                              [0, 0, 0, 1]])
-        y_rot_mat = np.array([[cos(rot[1]), 0, sin(rot[1]), 0],
-                              [0, 1, 0, 0],
-                              [-sin(rot[1]), 0, cos(rot[1]), 0],
-                              [0, 0, 0, 1]])
-        z_rot_mat = np.array([[cos(rot[2]), -sin(rot[2]), 0, 0],
-                              [sin(rot[2]), cos(rot[2]), 0, 0],
-                              [0, 0, 1, 0],
-                              [0, 0, 0, 1]])
-        return z_rot_mat.dot(y_rot_mat.dot(x_rot_mat))
+        rot_mat = np.empty((4, 4))
+        compose_matrix((0, 0, 0), rot, (1, 1, 1), rot_mat)
+        return rot_mat
 
     # Returns the scale matrix of the scale vector
     def get_scale_mat(self, scale):
@@ -83,95 +101,133 @@ class Transform:
                          [0, 0, scale[2], 0],
                          [0, 0, 0, 1]])
 
-    # Returns the local translation of the transform
+    # Returns a copy of the local translation of the transform
     def get_translation(self):
-        return self.trans
+        return self.trans.copy()
 
     # Sets the local translation of the transform
     def set_translation(self, translation):
-        self.trans = translation
+        self.trans[:] = translation
         self.update()
 
     # Returns the translation of the world transform
     def get_world_translation(self):
-        world_trans = self.parent_matrix.dot(np.array([self.trans[0],
-                                                       self.trans[1],
-                                                       self.trans[2],
-                                                       1]))
-        return np.array([world_trans[0], world_trans[1], world_trans[2]])
+        return self.get_world_matrix_view()[:3, 3].copy()
 
     # Sets the world translation of the transform
     def set_world_translation(self, world_translation):
         # Convert world translation to local
-        local_trans_mat = np.linalg.inv(self.parent_matrix).dot(self.get_trans_mat(world_translation))
-        self.trans = np.array([local_trans_mat[0][3],
-                               local_trans_mat[1][3],
-                               local_trans_mat[2][3]])
+        inv_parent_mat = np.linalg.inv(self.get_parent_matrix_view())
+        self.trans[:] = inv_parent_mat[:3, :3].dot(world_translation) + inv_parent_mat[:3, 3]
         self.update()
 
-    # Returns the local rotation of the transform
+    # Returns a copy of the local rotation of the transform
     def get_rotation(self):
-        return self.rot
+        return self.rot.copy()
 
     # Returns the world rotation of the world transform
     def get_world_rotation(self):
-        world_mat = self.parent_matrix.dot(self.get_mat())
-        world_transform = Transform()
-        world_transform.set_matrix(world_mat)
-        return world_transform.get_rotation()
+        self.decompose_world()
+        return self.world_rot.copy()
 
     # Sets the rotation of the transform
     def set_rotation(self, rotation):
-        self.rot = rotation
+        self.rot[:] = rotation
         self.update()
 
-    # Returns the local scale of the transform
+    # Returns a copy of the local scale of the transform
     def get_scale(self):
-        return self.scale
+        return self.scale.copy()
 
     # Returns the world scale of the world transform
     def get_world_scale(self):
-        world_mat = Transform()
-        world_mat.set_matrix(self.get_world_matrix())
-        return world_mat.get_scale()
+        self.decompose_world()
+        return self.world_scale.copy()
 
     # Sets the scale of the transform
     def set_scale(self, scale):
-        self.scale = scale
+        self.scale[:] = scale
         self.update()
 
     # Sets the world scale of the transform
     def set_world_scale(self, world_scale):
         # Convert world scale to local
-        parent_transform = Transform()
-        parent_transform.set_matrix(self.parent_matrix)
-        scale_mat = np.linalg.inv(self.get_scale_mat(parent_transform.get_scale())).dot(self.get_scale_mat(world_scale))
-        self.scale = np.array([scale_mat[0][0], scale_mat[1][1], scale_mat[2][2]])
+        self.scale[:] = world_scale / np.linalg.norm(self.get_parent_matrix_view()[:3, :3], axis=0)
         self.update()
 
+    # Recalculates world_rot and world_scale if the world matrix changed since they were calculated
+    def decompose_world(self):
+        world_matrix = self.get_world_matrix_view()
+        if not self.world_decomposed or self.store is not None:
+            decompose_matrix(world_matrix, None, self.world_rot, self.world_scale)
+            self.world_decomposed = True
+
     # Recalculates the internal local matrix from transform properties
     def recalculate(self):
-        scale_mat = self.get_scale_mat(self.scale)
-        rot_mat = self.get_rot_mat(self.rot)
-        trans_mat = self.get_trans_mat(self.trans)
-
-        self.local_matrix = trans_mat.dot(rot_mat.dot(scale_mat))
+        compose_matrix(self.trans, self.rot, self.scale, self.local_matrix)
 
-    # Returns the local matrix of the transform
+    # Returns a copy of the local matrix of the transform
     def get_mat(self):
+        return self.get_mat_view().copy()
+
+    # Returns the local matrix of the transform without copying it
+    # The returned matrix is reused, and changes when the transform changes
+    def get_mat_view(self):
+        if self.store is not None:
+            return self.store.get_local_matrix(self)
         if self.dirty:
             self.recalculate()
+            self.dirty = False
         return self.local_matrix
 
-    # Returns the world matrix of the transform
+    # Returns a copy of the world matrix of the transform
     def get_world_matrix(self):
-        return self.parent_matrix.dot(self.get_mat())
+        return self.get_world_matrix_view().copy()
+
+    # Returns the world matrix of the transform without copying it
+    # The world matrix is cached until the transform or one of its parents changes
+    # The returned matrix is reused, and changes when the transform changes
+    def get_world_matrix_view(self):
+        if self.store is not None:
+            return self.store.get_world_matrix(self)
+        if not self.world_dirty:
+            return self.world_matrix
+
+        # Walk up to the first parent with an up to date world matrix, then recalculate world matrices on the way down
+        # This is done with a loop rather than recursion, so chains of any depth work
+        dirty = [self]
+        parent = self.parent
+        while parent is not None and parent.store is None and parent.world_dirty:
+            dirty.append(parent)
+            parent = parent.parent
+        for transform in reversed(dirty):
+            np.dot(transform.get_parent_matrix_view(), transform.get_mat_view(), out=transform.world_matrix)
+            transform.world_dirty = False
+            transform.world_decomposed = False
+        return self.world_matrix
+
+    # Marks the world matrices of the transform and its children as out of date
+    # Children of an out of date transform are always out of date, so propagation stops there
+    def invalidate_world(self):
+        stack = [self]
+        while len(stack) > 0:
+            transform = stack.pop()
+            if transform.store is not None:
+                transform.store.invalidate_world(transform)
+            elif not transform.world_dirty:
+                transform.world_dirty = True
+                stack += transform.children
 
     # Updates the matrix after a change
+    # Matrices are recalculated the next time they are read, so repeated changes only cost one recalculation
     def update(self):
-        self.recalculate()
+        if self.store is not None:
+            self.store.write_properties(self)
+        else:
+            self.dirty = True
+            self.invalidate_world()
         if self.on_matrix_update is not None:
-            self.on_matrix_update(self.get_world_matrix())
+            self.on_matrix_update()
 
     # Serializes transform to dictionary
     def to_dict(self):
@@ -183,7 +239,67 @@ class Transform:
 
     # Deserializes transform from dictionary
     def load_from_dict(self, dictionary):
-        self.trans = np.array(dictionary["translation"])
-        self.rot = np.array(dictionary["rotation"])
-        self.scale = np.array(dictionary["scale"])
+        self.trans[:] = dictionary["translation"]
+        self.rot[:] = dictionary["rotation"]
+        self.scale[:] = dictionary["scale"]
         self.update()
+
+
+# Below this cosine of the Y rotation, matrices are decomposed as if they were in gimbal lock
+GIMBAL_LOCK_EPSILON = 1e-7
+
+
+# Writes the matrix of a translation, euler rotation and scale into the 4x4 array "out"
+# Matrices are composed as translation * rotation * scale, with rotations applied in X, Y, Z order
+def compose_matrix(trans, rot, scale, out):
+    # Python floats are much faster than NumPy scalars for scalar math
+    trans_x, trans_y, trans_z = trans.tolist() if type(trans) is np.ndarray else trans
+    rot_x, rot_y, rot_z = rot.tolist() if type(rot) is np.ndarray else rot
+    scale_x, scale_y, scale_z = scale.tolist() if type(scale) is np.ndarray else scale
+    cos_x, sin_x = cos(rot_x), sin(rot_x)
+    cos_y, sin_y = cos(rot_y), sin(rot_y)
+    cos_z, sin_z = cos(rot_z), sin(rot_z)
+    out.ravel()[:] = (cos_z * cos_y * scale_x,
+                      (cos_z * sin_y * sin_x - sin_z * cos_x) * scale_y,
+                      (cos_z * sin_y * cos_x + sin_z * sin_x) * scale_z,
+                      trans_x,
+                      sin_z * cos_y * scale_x,
+                      (sin_z * sin_y * sin_x + cos_z * cos_x) * scale_y,
+                      (sin_z * sin_y * cos_x - cos_z * sin_x) * scale_z,
+                      trans_y,
+                      -sin_y * scale_x,
+                      cos_y * sin_x * scale_y,
+                      cos_y * cos_x * scale_z,
+                      trans_z,
+                      0, 0, 0, 1)
+
+
+# Writes the translation, euler rotation and scale of a 4x4 matrix into "trans_out", "rot_out" and "scale_out"
+# Outputs that are None are skipped
+def decompose_matrix(matrix, trans_out, rot_out, scale_out):
+    (m00, m01, m02, m03), (m10, m11, m12, m13), (m20, m21, m22, m23) = matrix[:3].tolist()
+    if trans_out is not None:
+        trans_out[:] = (m03, m13, m23)
+
+    # Scale is the length of each basis vector
+    scale_x = sqrt(m00 * m00 + m10 * m10 + m20 * m20)
+    scale_y = sqrt(m01 * m01 + m11 * m11 + m21 * m21)
+    scale_z = sqrt(m02 * m02 + m12 * m12 + m22 * m22)
+    if scale_out is not None:
+        scale_out[:] = (scale_x, scale_y, scale_z)
+
+    # Rotation is read from the normalized basis vectors
+    if rot_out is not None:
+        r01, r11 = m01 / scale_y, m11 / scale_y
+        r20, r21, r22 = m20 / scale_x, m21 / scale_y, m22 / scale_z
+        cos_y = sqrt(r21 * r21 + r22 * r22)
+        if cos_y < GIMBAL_LOCK_EPSILON:
+            # At a Y rotation of +-90 degrees, X and Z rotations turn around the same axis, so Z rotation is set to 0
+            # and X rotation is read from the Y basis vector
+            rot_out[:] = (atan2(r01 if r20 < 0 else -r01, r11), atan2(-r20, cos_y), 0)
+        else:
+            # Z rotation is read after undoing X rotation, so the two stay consistent close to gimbal lock
+            rot_x = atan2(r21, r22)
+            cos_x, sin_x = cos(rot_x), sin(rot_x)
+            r02, r12 = m02 / scale_z, m12 / scale_z
+            rot_out[:] = (rot_x, atan2(-r20, cos_y), atan2(sin_x * r02 - cos_x * r01, cos_x * r11 - sin_x * r12))
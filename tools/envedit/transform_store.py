@@ -0,0 +1,235 @@
+"""
+Stores the transforms of a scene graph in contiguous arrays, so they can be updated with a few vectorized operations.
+
+@author Ben Giacalone
+"""
+import numpy as np
+
+from tools.envedit.transform import GIMBAL_LOCK_EPSILON
+
+
+class TransformStore:
+
+    # Adds the transforms of "root" and its descendants to the store
+    # Transforms in the store read and write their properties and matrices through it, until the store is released
+    def __init__(self, root):
+        self.root = root
+        self.transforms = []
+        self.structure_dirty = False    # If nodes were added or removed since the store was laid out
+        self.build()
+
+    # Lays out the transforms of the scene graph in depth first order, so every subtree is a contiguous range
+    def build(self):
+        self.release()
+        self.structure_dirty = False
+
+        # Collect nodes in depth first order
+        nodes = []
+        depths = []
+        parents = []
+        stack = [(self.root, 0, -1)]
+        while len(stack) > 0:
+            node, depth, parent = stack.pop()
+            index = len(nodes)
+            nodes.append(node)
+            depths.append(depth)
+            parents.append(parent)
+            for child in reversed(node.children):
+                stack.append((child, depth + 1, index))
+
+        # Subtrees end where the next node at the same or a lower depth starts
+        num_nodes = len(nodes)
+        subtree_ends = [num_nodes] * num_nodes
+        open_nodes = []
+        for i in range(num_nodes):
+            while len(open_nodes) > 0 and depths[open_nodes[-1]] >= depths[i]:
+                subtree_ends[open_nodes.pop()] = i
+            open_nodes.append(i)
+
+        self.parents = np.array(parents, dtype=np.int64)
+        self.subtree_ends = np.array(subtree_ends, dtype=np.int64)
+        depths = np.array(depths, dtype=np.int64)
+        self.levels = [np.flatnonzero(depths == depth) for depth in range(depths.max() + 1)]
+
+        self.trans = np.zeros((num_nodes, 3))
+        self.rot = np.zeros((num_nodes, 3))
+        self.scale = np.ones((num_nodes, 3))
+        self.local = np.tile(np.identity(4), (num_nodes, 1, 1))
+        self.world = np.tile(np.identity(4), (num_nodes, 1, 1))
+        self.local_dirty = np.ones(num_nodes, dtype=bool)
+        self.world_dirty = np.ones(num_nodes, dtype=bool)
+
+        # Move the transform properties into the store
+        self.transforms = [node.transform for node in nodes]
+        for i, transform in enumerate(self.transforms):
+            self.trans[i] = transform.trans
+            self.rot[i] = transform.rot
+            self.scale[i] = transform.scale
+            transform.store = self
+            transform.index = i
+            transform.trans = self.trans[i]
+            transform.rot = self.rot[i]
+            transform.scale = self.scale[i]
+
+    # Gives the transforms in the store their own copies of their properties and removes them from the store
+    def release(self):
+        for transform in self.transforms:
+            if transform.store is not self:
+                continue
+            transform.trans = transform.trans.copy()
+            transform.rot = transform.rot.copy()
+            transform.scale = transform.scale.copy()
+            transform.store = None
+            transform.index = None
+            transform.dirty = True
+            transform.world_dirty = True
+        self.transforms = []
+
+    # Marks the layout as out of date, so it is rebuilt the next time the store is used
+    def invalidate_structure(self):
+        self.structure_dirty = True
+
+    # Rebuilds the layout if nodes were added or removed
+    # Returns whether the transform is still in the store
+    def check_structure(self, transform):
+        if self.structure_dirty:
+            self.build()
+        return transform.store is self
+
+    # Copies the properties of a transform into the store and marks its matrices as out of date
+    def write_properties(self, transform):
+        if not self.check_structure(transform):
+            transform.update()
+            return
+        i = transform.index
+        self.trans[i] = transform.trans
+        self.rot[i] = transform.rot
+        self.scale[i] = transform.scale
+        transform.trans = self.trans[i]
+        transform.rot = self.rot[i]
+        transform.scale = self.scale[i]
+        self.local_dirty[i] = True
+        self.world_dirty[i:self.subtree_ends[i]] = True
+
+    # Marks the world matrices of a transform and its children as out of date
+    def invalidate_world(self, transform):
+        if not self.check_structure(transform):
+            transform.invalidate_world()
+            return
+        i = transform.index
+        self.world_dirty[i:self.subtree_ends[i]] = True
+
+    # Returns the local matrix of a transform
+    # The matrix is a view into the store
+    def get_local_matrix(self, transform):
+        if not self.check_structure(transform):
+            return transform.get_mat_view()
+        i = transform.index
+        if self.local_dirty[i]:
+            self.local[i:i + 1] = compose_matrices(self.trans[i:i + 1], self.rot[i:i + 1], self.scale[i:i + 1])
+            self.local_dirty[i] = False
+        return self.local[i]
+
+    # Returns the world matrix of a transform
+    # The matrix is a view into the store
+    def get_world_matrix(self, transform):
+        if not self.check_structure(transform):
+            return transform.get_world_matrix_view()
+        i = transform.index
+        if self.world_dirty[i]:
+            # Walk up to the first parent with an up to date world matrix, then recalculate world matrices on the way
+            # down
+            dirty = [i]
+            parent = self.parents[i]
+            while parent >= 0 and self.world_dirty[parent]:
+                dirty.append(parent)
+                parent = self.parents[parent]
+            for j in reversed(dirty):
+                dirty_transform = self.transforms[j]
+                self.world[j] = self.get_parent_matrix(dirty_transform).dot(self.get_local_matrix(dirty_transform))
+                self.world_dirty[j] = False
+        return self.world[i]
+
+    # Returns the parent matrix of a transform
+    def get_parent_matrix(self, transform):
+        if not self.check_structure(transform):
+            return transform.get_parent_matrix_view()
+        parent = self.parents[transform.index]
+        if parent >= 0:
+            return self.get_world_matrix(self.transforms[parent])
+
+        # The root's parent is outside of the store
+        if transform.parent is not None:
+            return transform.parent.get_world_matrix_view()
+        return transform.parent_matrix
+
+    # Recalculates all out of date local and world matrices
+    # World matrices are calculated one depth level at a time, so each level is a single batched product
+    def update(self):
+        if self.structure_dirty:
+            self.build()
+
+        dirty = np.flatnonzero(self.local_dirty)
+        if len(dirty) > 0:
+            self.local[dirty] = compose_matrices(self.trans[dirty], self.rot[dirty], self.scale[dirty])
+            self.local_dirty[dirty] = False
+
+        if not self.world_dirty.any():
+            return
+        root_dirty = self.levels[0][self.world_dirty[self.levels[0]]]
+        if len(root_dirty) > 0:
+            self.get_world_matrix(self.transforms[0])
+        for level in self.levels[1:]:
+            dirty = level[self.world_dirty[level]]
+            if len(dirty) > 0:
+                self.world[dirty] = np.matmul(self.world[self.parents[dirty]], self.local[dirty])
+        self.world_dirty[:] = False
+
+
+# Returns the matrices of rows of translations, euler rotations and scales
+# Matrices are composed as translation * rotation * scale, with rotations applied in X, Y, Z order
+def compose_matrices(trans, rot, scale):
+    cos_x, cos_y, cos_z = np.cos(rot).T
+    sin_x, sin_y, sin_z = np.sin(rot).T
+
+    matrices = np.zeros((len(trans), 4, 4))
+    matrices[:, 0, 0] = cos_z * cos_y
+    matrices[:, 0, 1] = cos_z * sin_y * sin_x - sin_z * cos_x
+    matrices[:, 0, 2] = cos_z * sin_y * cos_x + sin_z * sin_x
+    matrices[:, 1, 0] = sin_z * cos_y
+    matrices[:, 1, 1] = sin_z * sin_y * sin_x + cos_z * cos_x
+    matrices[:, 1, 2] = sin_z * sin_y * cos_x - cos_z * sin_x
+    matrices[:, 2, 0] = -sin_y
+    matrices[:, 2, 1] = cos_y * sin_x
+    matrices[:, 2, 2] = cos_y * cos_x
+    matrices[:, :3, :3] *= scale[:, np.newaxis, :]
+    matrices[:, :3, 3] = trans
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+# Returns rows of the translations, euler rotations and scales of matrices
+# Inverse of compose_matrices, rotations are read the same way as in Transform's decompose_matrix
+def decompose_matrices(matrices):
+    trans = matrices[:, :3, 3].copy()
+
+    # Scale is the length of each basis vector
+    scale = np.linalg.norm(matrices[:, :3, :3], axis=1)
+
+    # Rotation is read from the normalized basis vectors
+    basis = matrices[:, :3, :3] / scale[:, np.newaxis, :]
+    r01, r02 = basis[:, 0, 1], basis[:, 0, 2]
+    r11, r12 = basis[:, 1, 1], basis[:, 1, 2]
+    r20, r21, r22 = basis[:, 2, 0], basis[:, 2, 1], basis[:, 2, 2]
+    cos_y = np.sqrt(r21 * r21 + r22 * r22)
+    rot_x = np.arctan2(r21, r22)
+    cos_x, sin_x = np.cos(rot_x), np.sin(rot_x)
+    rot_z = np.arctan2(sin_x * r02 - cos_x * r01, cos_x * r11 - sin_x * r12)
+
+    # Matrices in gimbal lock get a Z rotation of 0, with X rotation read from the Y basis vector
+    locked = cos_y < GIMBAL_LOCK_EPSILON
+    if locked.any():
+        rot_x[locked] = np.arctan2(np.where(r20 < 0, r01, -r01), r11)[locked]
+        rot_z[locked] = 0
+    rot = np.stack((rot_x, np.arctan2(-r20, cos_y), rot_z), axis=1)
+    return trans, rot, scale
@@ -0,0 +1,37 @@
+"""
+Lets external code drive an environment one tick at a time.
+
+@author Ben Giacalone
+"""
+from tools.run.player import Player
+
+
+class Environment(Player):
+
+    # Each step advances the physics engine by "dt", split into "substeps" physics steps
+    # If "use_transform_store" is True, the scene's transforms are kept in a TransformStore and updated in bulk
+    # If "merge_static_bodies" is True, static rigid bodies are merged into one body when the environment is loaded
+    def __init__(self, env_name, dt=1 / 60, substeps=1, use_transform_store=False, merge_static_bodies=False):
+        Player.__init__(self, env_name, headless=True, fixed_dt=dt, substeps=substeps,
+                        use_transform_store=use_transform_store, merge_static_bodies=merge_static_bodies)
+        self.trial_data = None
+
+    # Starts a new trial and returns the first observation
+    def reset(self, trial_data=None):
+        self.trial_data = {} if trial_data is None else trial_data
+        Player.reset(self, self.trial_data)
+        return self.observe()
+
+    # Advances the environment by exactly one physics and update tick
+    # Components receive "actions" through the "action" event before physics is stepped
+    # Returns whether the trial has finished
+    def step(self, actions=None):
+        simulation = self.simulation
+        if actions is not None:
+            simulation.act(actions)
+        simulation.step(self.fixed_dt, self.substeps)
+        return simulation.finished
+
+    # Returns the current observation
+    def observe(self):
+        return self.simulation.observe()
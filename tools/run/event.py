@@ -4,14 +4,32 @@ Event system for EDEnv.
 @author Ben Giacalone
 """
 import functools
+import weakref
 
-COMPONENTS = []
 HANDLERS = {}
+BUSES = weakref.WeakSet()
+
+
+# Returns the key identifying the class a handler was declared in
+def handler_class_key(func):
+    return func.__module__, func.__qualname__.rsplit(".", 1)[0]
+
+
+# Returns the key identifying a class
+def class_key(cls):
+    return cls.__module__, cls.__qualname__
 
 
 # Decorator for event handlers
-def handler(event_queue_name="main"):
+# Batched handlers receive the list of argument tuples of all queued events once per flush
+# Batching is opt-in, handlers declared without "batch=True" get one call per queued event
+# The bundled components don't handle collision events, they only post them: the colliders post
+# "collision_enter"/"collision_exit" (node ID, other node ID) once per contact change, so scripts that handle many
+# collisions should declare those handlers with "batch=True"
+def handler(event_queue_name="main", batch=False):
     def wrapper(func):
+        func.batch = batch
+
         # If event queue name is not in HANDLERS, create a new dict
         if event_queue_name not in HANDLERS:
             HANDLERS[event_queue_name] = {}
@@ -21,25 +39,165 @@ def handler(event_queue_name="main"):
         if event_name not in HANDLERS[event_queue_name]:
             HANDLERS[event_queue_name][event_name] = []
 
-        HANDLERS[event_queue_name][event_name].append(func)
+        # If the handler was declared before (e.g. the module was reloaded), replace it
+        handlers = HANDLERS[event_queue_name][event_name]
+        for old_func in handlers:
+            if handler_class_key(old_func) == handler_class_key(func):
+                handlers.remove(old_func)
+                for bus in BUSES:
+                    bus.remove_handler(event_queue_name, event_name, old_func)
+                break
+        handlers.append(func)
+
+        # Register components that were added to buses before this handler was declared
+        for bus in BUSES:
+            bus.add_handler(event_queue_name, event_name, func)
+
+        return func
 
     return wrapper
 
 
-# Sends event to event queue
+class EventBus:
+    # Bus used by the module level functions
+    active = None
+
+    def __init__(self):
+        self.components = []
+        self.receivers = {}
+        self.queued_events = {}
+        self.declared = {}          # Maps (component class, handler) to whether the class declares the handler
+        BUSES.add(self)
+
+        for event_queue_name in HANDLERS:
+            for event_name in HANDLERS[event_queue_name]:
+                for func in HANDLERS[event_queue_name][event_name]:
+                    self.add_handler(event_queue_name, event_name, func)
+
+    # Sends event to event queue
+    def send_event(self, event_queue_name, event_name, *args, **kwargs):
+        # If no such handler is registered, quit early
+        if event_queue_name not in self.receivers or event_name not in self.receivers[event_queue_name]:
+            return
+
+        # Broadcast the event
+        # Receiver lists are replaced rather than modified, so handlers may register or unregister components
+        for receivers in tuple(self.receivers[event_queue_name][event_name].values()):
+            for receiver in receivers:
+                receiver(*args, **kwargs)
+
+    # Queues an event to be delivered on the next flush
+    def post_event(self, event_queue_name, event_name, *args):
+        key = (event_queue_name, event_name)
+        if key not in self.queued_events:
+            self.queued_events[key] = []
+        self.queued_events[key].append(args)
+
+    # Delivers all queued events
+    # Events are delivered grouped by name, in the order they were first posted
+    # Events posted while flushing are delivered on the next flush
+    def flush(self):
+        queued_events = self.queued_events
+        self.queued_events = {}
+
+        for (event_queue_name, event_name), events in queued_events.items():
+            if event_queue_name not in self.receivers or event_name not in self.receivers[event_queue_name]:
+                continue
+
+            for func, receivers in tuple(self.receivers[event_queue_name][event_name].items()):
+                if func.batch:
+                    for receiver in receivers:
+                        receiver(events)
+                else:
+                    for args in events:
+                        for receiver in receivers:
+                            receiver(*args)
+
+    # Registers a component to the bus
+    def register(self, component):
+        self.components.append(component)
+        for event_queue_name in self.receivers:
+            for event_name in self.receivers[event_queue_name]:
+                for func in self.receivers[event_queue_name][event_name]:
+                    self.add_receiver(component, event_queue_name, event_name, func)
+
+    # Unregisters a component from the bus
+    def unregister(self, component):
+        if component not in self.components:
+            return
+        self.components.remove(component)
+        for queue_receivers in self.receivers.values():
+            for event_receivers in queue_receivers.values():
+                for func in event_receivers:
+                    event_receivers[func] = [receiver for receiver in event_receivers[func]
+                                             if receiver.__self__ is not component]
+
+    # Unregisters all components from the bus
+    def clear(self):
+        self.components.clear()
+        self.queued_events.clear()
+        for queue_receivers in self.receivers.values():
+            for event_receivers in queue_receivers.values():
+                for func in event_receivers:
+                    event_receivers[func] = []
+
+    # Adds a handler declaration to the dispatch table
+    def add_handler(self, event_queue_name, event_name, func):
+        if event_queue_name not in self.receivers:
+            self.receivers[event_queue_name] = {}
+        if event_name not in self.receivers[event_queue_name]:
+            self.receivers[event_queue_name][event_name] = {}
+        self.receivers[event_queue_name][event_name][func] = []
+
+        for component in self.components:
+            self.add_receiver(component, event_queue_name, event_name, func)
+
+    # Removes a handler declaration from the dispatch table
+    def remove_handler(self, event_queue_name, event_name, func):
+        self.receivers[event_queue_name][event_name].pop(func, None)
+
+    # Adds the bound handler of a component to the dispatch table, if the component's class declares it
+    def add_receiver(self, component, event_queue_name, event_name, func):
+        # Only components whose class or base classes declared the handler receive it
+        declared_key = (type(component), func)
+        if declared_key not in self.declared:
+            key = handler_class_key(func)
+            self.declared[declared_key] = any(class_key(cls) == key for cls in type(component).__mro__)
+        if not self.declared[declared_key]:
+            return
+
+        # Subclasses that override a handler only receive the event once, through their override
+        bound_handler = getattr(component, func.__name__)
+        override = getattr(bound_handler, "__func__", None)
+        receivers = self.receivers[event_queue_name][event_name]
+        if override is not func and override in receivers:
+            return
+        receivers[func] = receivers[func] + [bound_handler]
+
+
+EventBus.active = EventBus()
+
+
+# Sends event to event queue of the active bus
 def send_event(event_queue_name, event_name, *args, **kwargs):
-    # If no such handler is registered, quit early
-    if event_queue_name not in HANDLERS or event_name not in HANDLERS[event_queue_name]:
-        return
+    EventBus.active.send_event(event_queue_name, event_name, *args, **kwargs)
+
 
-    # Broadcast the event
-    handlers = HANDLERS[event_queue_name][event_name]
-    for handler in handlers:
-        for component in COMPONENTS:
-            if type(component).__name__ == handler.__qualname__.split(".")[0]:
-                handler(component, *args, **kwargs)
+# Queues an event on the active bus
+def post_event(event_queue_name, event_name, *args):
+    EventBus.active.post_event(event_queue_name, event_name, *args)
 
 
-# Registers a component to the event system
+# Registers a component to the active bus
 def register_component(component):
-    COMPONENTS.append(component)
+    EventBus.active.register(component)
+
+
+# Unregisters a component from the active bus
+def unregister_component(component):
+    EventBus.active.unregister(component)
+
+
+# Unregisters all components from the active bus
+def clear_components():
+    EventBus.active.clear()
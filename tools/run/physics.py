@@ -3,13 +3,154 @@ Provides methods for interacting with the physics engine.
 
 @author Ben Giacalone
 """
+import numpy as np
+from panda3d.bullet import BulletRigidBodyNode
+from panda3d.core import LPoint3f, LVecBase3f
 from tools.envedit import helper
+from tools.envedit.transform_store import decompose_matrices
 
 
 class Physics:
 
     def __init__(self, physics_world):
         self.physics_world = physics_world
+        self.node_ids = {}          # Maps rigid body names to the IDs of the nodes they belong to
+        self.contacts = ContactTable()
+        self.bodies = BodySync()
+        self.merged_bodies = {}     # Maps names of merged static bodies to the names of the bodies of their shapes
+        self.merged_paths = {}      # Maps names of bodies that were merged to the node paths of their merged bodies
+        self.merged_contacts = set()    # Pairs of body names touching through merged shapes in the last step
+        self.held_contacts = set()      # Pairs of merged_contacts that were missing in the last step
+
+    # Removes all contacts, synced bodies and merged bodies
+    def clear(self):
+        self.contacts.clear()
+        self.bodies.clear()
+        self.merged_bodies = {}
+        self.merged_paths = {}
+        self.merged_contacts = set()
+        self.held_contacts = set()
+
+    # Removes the rigid bodies of a node's transform from the physics world
+    def remove_node_bodies(self, transform):
+        for body_path in self.bodies.remove(transform):
+            self.remove_body(body_path)
+
+    # Removes a rigid body and the constraints attached to it from the physics world, and removes its node path
+    # Bodies that were merged are removed by rebuilding their merged body without their shapes
+    def remove_body(self, body_path):
+        body = body_path.node()
+        self.contacts.unsubscribe(body.name)
+        merged_path = self.merged_paths.pop(body.name, None)
+        if merged_path is not None:
+            self.remove_merged_shapes(merged_path, body.name)
+        else:
+            for constraint in self.physics_world.getConstraints():
+                if constraint.getRigidBodyA() == body or constraint.getRigidBodyB() == body:
+                    self.physics_world.removeConstraint(constraint)
+            self.physics_world.removeRigidBody(body)
+        body_path.removeNode()
+
+    # Merges static rigid bodies into a single body named "name", attached to "parent_path"
+    # Each static body adds a broadphase entry, while the merged body only adds one, with its shapes kept in a tree
+    # Shapes remember the body they came from, so contacts and raycasts still report the IDs of the original nodes
+    # Kinematic, scaled and constrained bodies are left as they are
+    # Returns the merged body's node path, or None if there were less than two bodies to merge
+    def merge_static_bodies(self, parent_path, name):
+        constrained = set()
+        for constraint in self.physics_world.getConstraints():
+            for body in (constraint.getRigidBodyA(), constraint.getRigidBodyB()):
+                if body is not None:
+                    constrained.add(body.name)
+
+        merged_paths = []
+        for body_path, kinematic in zip(self.bodies.body_paths, self.bodies.kinematic):
+            body = body_path.node()
+            if (not kinematic and body.isStatic() and body.getNumShapes() > 0 and body.name not in constrained
+                    and body_path.getScale().almostEqual(LVecBase3f(1, 1, 1))):
+                merged_paths.append(body_path)
+        if len(merged_paths) < 2:
+            return None
+
+        shapes = []
+        for body_path in merged_paths:
+            body = body_path.node()
+            body_transform = body_path.getTransform()
+            for i in range(body.getNumShapes()):
+                shapes.append((body.getShape(i), body_transform.compose(body.getShapeTransform(i)), body.name))
+            self.physics_world.removeRigidBody(body)
+        return self.attach_merged_body(parent_path, name, shapes)
+
+    # Attaches a body named "name" to "parent_path", made of (shape, shape transform, body name) tuples
+    # Shapes are added in order, so the index of a shape in the merged body is the index of its body's name
+    def attach_merged_body(self, parent_path, name, shapes):
+        merged_node = BulletRigidBodyNode(name)
+        for shape, shape_transform, _ in shapes:
+            merged_node.addShape(shape, shape_transform)
+        merged_path = parent_path.attach_new_node(merged_node)
+        self.physics_world.attachRigidBody(merged_node)
+        self.merged_bodies[name] = [body_name for _, _, body_name in shapes]
+        for body_name in self.merged_bodies[name]:
+            self.merged_paths[body_name] = merged_path
+        return merged_path
+
+    # Rebuilds a merged body without the shapes of the body named "body_name"
+    # Bullet can't remove a shape that a compound shape holds more than once, so a new merged body is attached
+    def remove_merged_shapes(self, merged_path, body_name):
+        merged_node = merged_path.node()
+        shapes = [(merged_node.getShape(i), merged_node.getShapeTransform(i), shape_body_name)
+                  for i, shape_body_name in enumerate(self.merged_bodies.pop(merged_node.name))
+                  if shape_body_name != body_name]
+        parent_path = merged_path.getParent()
+        self.physics_world.removeRigidBody(merged_node)
+        merged_path.removeNode()
+        if len(shapes) > 0:
+            self.attach_merged_body(parent_path, merged_node.name, shapes)
+
+    # Returns the name of the body a shape of a rigid body came from
+    # Only merged bodies have shapes from other bodies, so other bodies return their own name
+    def get_shape_body_name(self, body_node, shape_index):
+        name = body_node.name
+        body_names = self.merged_bodies.get(name)
+        if body_names is None or not 0 <= shape_index < len(body_names):
+            return name
+        return body_names[shape_index]
+
+    # Updates the contact table from the contacts found during the last physics step
+    # Should be called once after every physics step
+    def update_contacts(self):
+        touching = {}
+        merged_contacts = set()
+        for manifold in self.physics_world.getManifolds():
+            # Manifolds exist for every pair of overlapping bounding boxes, only count pairs with contact points
+            num_points = manifold.getNumManifoldPoints()
+            if num_points == 0:
+                continue
+            node_0 = manifold.getNode0()
+            node_1 = manifold.getNode1()
+            merged_0 = node_0.name in self.merged_bodies
+            merged_1 = node_1.name in self.merged_bodies
+            if not merged_0 and not merged_1:
+                touching.setdefault(node_0.name, set()).add(node_1.name)
+                touching.setdefault(node_1.name, set()).add(node_0.name)
+                continue
+
+            # Each contact point of a merged body holds the index of the shape it touches
+            for i in range(num_points):
+                point = manifold.getManifoldPoint(i)
+                name_0 = self.get_shape_body_name(node_0, point.getIndex0()) if merged_0 else node_0.name
+                name_1 = self.get_shape_body_name(node_1, point.getIndex1()) if merged_1 else node_1.name
+                merged_contacts.add((name_0, name_1))
+
+        # Bullet drops the manifold of a merged shape for single steps while a body rests on it, so contacts with
+        # merged shapes only end once they have been missing for two steps in a row
+        held_contacts = self.merged_contacts - merged_contacts - self.held_contacts
+        self.merged_contacts = merged_contacts | held_contacts
+        self.held_contacts = held_contacts
+        for name_0, name_1 in self.merged_contacts:
+            touching.setdefault(name_0, set()).add(name_1)
+            touching.setdefault(name_1, set()).add(name_0)
+        self.contacts.update(touching, self.get_body_node_id)
 
     # Performs a raycast against objects in the scene
     def raycast(self, ray_origin, ray_dir):
@@ -21,12 +162,313 @@ class Physics:
 
         # Return a RaycastResult object
         raycast_obj = RaycastResult()
-        raycast_obj.hit_node_id = result.getNode().name[:-11]
+        raycast_obj.hit_node_id = self.get_node_id(result.getNode(), result.getTriangleIndex())
         raycast_obj.hit_point = helper.panda_vec3_to_np(result.getHitPos())
         return raycast_obj
 
+    # Performs a raycast for each row of "origins" and "dirs", up to "max_dist" away from the origin
+    # If "all_hits" is True, every object along each ray is returned rather than only the closest one
+    def raycast_batch(self, origins, dirs, max_dist=9999, all_hits=False):
+        origins = np.asarray(origins, dtype=np.float32).reshape(-1, 3)
+        dirs = np.asarray(dirs, dtype=np.float32).reshape(-1, 3)
+        lengths = np.linalg.norm(dirs, axis=1, keepdims=True)
+        ends = origins + dirs / np.where(lengths > 0, lengths, 1) * max_dist
+        rays = zip(origins.tolist(), ends.tolist())
+
+        if all_hits:
+            return self.raycast_batch_all(rays, len(origins), max_dist)
+
+        ray_indices = []
+        hits = []
+        ray_test = self.physics_world.rayTestClosest
+        for i, (origin, end) in enumerate(rays):
+            result = ray_test(LPoint3f(*origin), LPoint3f(*end))
+            if result.hasHit():
+                ray_indices.append(i)
+                hits.append(result)
+
+        # Rays that missed keep the default row values
+        batch_obj = RaycastBatchResult(len(origins))
+        batch_obj.hits[ray_indices] = True
+        self.fill_hit_rows(batch_obj, ray_indices, hits, max_dist)
+        return batch_obj
+
+    # Returns every hit along each ray, ordered by ray and then by distance
+    def raycast_batch_all(self, rays, num_rays, max_dist):
+        ray_indices = []
+        hits = []
+        ray_test = self.physics_world.rayTestAll
+        for i, (origin, end) in enumerate(rays):
+            result = ray_test(LPoint3f(*origin), LPoint3f(*end))
+            if result.hasHits():
+                ray_hits = sorted(result.getHits(), key=lambda hit: hit.getHitFraction())
+                ray_indices += [i] * len(ray_hits)
+                hits += ray_hits
+
+        batch_obj = RaycastBatchResult(len(hits))
+        batch_obj.ray_indices = np.array(ray_indices, dtype=np.int64)
+        batch_obj.hits = np.zeros(num_rays, dtype=bool)
+        batch_obj.hits[batch_obj.ray_indices] = True
+        self.fill_hit_rows(batch_obj, range(len(hits)), hits, max_dist)
+        return batch_obj
+
+    # Copies the results of Bullet ray hits into rows of a RaycastBatchResult
+    def fill_hit_rows(self, batch_obj, rows, hits, max_dist):
+        if len(hits) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        batch_obj.points[rows] = [tuple(hit.getHitPos()) for hit in hits]
+        batch_obj.normals[rows] = [tuple(hit.getHitNormal()) for hit in hits]
+        batch_obj.distances[rows] = [hit.getHitFraction() for hit in hits]
+        batch_obj.distances[rows] *= max_dist
+        batch_obj.node_ids[rows] = [self.get_node_id(hit.getNode(), hit.getTriangleIndex()) for hit in hits]
+
+    # Returns the ID of the node a rigid body belongs to
+    # For merged bodies, "shape_index" is the index of the shape that was hit, which Bullet reports as the triangle
+    # index of ray hits on compound shapes
+    def get_node_id(self, body_node, shape_index=-1):
+        return self.get_body_node_id(self.get_shape_body_name(body_node, shape_index))
+
+    # Returns the ID of the node a rigid body belongs to, given the rigid body's name
+    def get_body_node_id(self, name):
+        node_id = self.node_ids.get(name)
+        if node_id is None:
+            node_id = name[:-len("_rigid_body")]
+            self.node_ids[name] = node_id
+        return node_id
+
+
+# Table of which rigid bodies are touching, updated once per physics step
+# "touching", "entered" and "exited" map rigid body names to sets of names of the bodies they are touching,
+# started touching this step, and stopped touching this step
+class ContactTable:
+
+    def __init__(self):
+        self.touching = {}
+        self.entered = {}
+        self.exited = {}
+        self.subscribers = {}       # Maps rigid body names to callbacks called when the body's contacts change
+
+    # Calls "callback" with the node IDs of bodies that started and stopped touching a rigid body, when any did
+    def subscribe(self, body_name, callback):
+        self.subscribers.setdefault(body_name, []).append(callback)
+
+    # Replaces the touching bodies of every rigid body, and notifies subscribers of bodies whose contacts changed
+    # "get_node_id" converts rigid body names to node IDs
+    def update(self, touching, get_node_id):
+        previous = self.touching
+        self.touching = touching
+        self.entered = {}
+        self.exited = {}
+        for name in previous.keys() | touching.keys():
+            curr_touching = touching.get(name, set())
+            prev_touching = previous.get(name, set())
+            if curr_touching == prev_touching:
+                continue
+            entered = curr_touching - prev_touching
+            exited = prev_touching - curr_touching
+            if len(entered) > 0:
+                self.entered[name] = entered
+            if len(exited) > 0:
+                self.exited[name] = exited
+            if name in self.subscribers:
+                entered_ids = [get_node_id(other) for other in entered]
+                exited_ids = [get_node_id(other) for other in exited]
+                for callback in self.subscribers[name]:
+                    callback(entered_ids, exited_ids)
+
+    # Removes the subscribers of a rigid body
+    def unsubscribe(self, body_name):
+        self.subscribers.pop(body_name, None)
+
+    # Removes all contacts and subscribers
+    def clear(self):
+        self.touching = {}
+        self.entered = {}
+        self.exited = {}
+        self.subscribers = {}
+
+
+# Copies transforms between rigid bodies and the scene graph in bulk
+# Kinematic bodies follow their nodes and are pushed before each physics step, the nodes of other bodies follow
+# their bodies and are pulled after each physics step
+class BodySync:
+
+    def __init__(self):
+        self.body_paths = []
+        self.transforms = []
+        self.kinematic = []
+        self.layout_dirty = False       # If bodies were added or removed since the arrays below were built
+        self.synced_bodies = 0          # Number of times a dynamic body's node was moved since the bodies were cleared
+        self.skipped_bodies = 0         # Number of times a dynamic body was skipped because it was sleeping
+
+        # Dynamic bodies
+        self.dynamic_paths = []
+        self.dynamic_nodes = []
+        self.dynamic_static = np.zeros(0, dtype=bool)
+        self.dynamic_scales = np.ones((0, 3))
+        self.levels = []                # Lists of (dynamic body indices, transforms), parents come before children
+
+        # Kinematic bodies
+        self.kinematic_paths = []
+        self.kinematic_transforms = []
+        self.kinematic_static = np.zeros(0, dtype=bool)     # Static bodies are only pushed when their node moves
+        self.kinematic_matrices = np.zeros((0, 4, 4))       # World matrices last pushed to kinematic bodies
+
+    # Adds a rigid body whose node has the transform "transform"
+    def add(self, body_path, transform, kinematic):
+        self.body_paths.append(body_path)
+        self.transforms.append(transform)
+        self.kinematic.append(kinematic)
+        self.layout_dirty = True
+
+    # Removes the rigid bodies of a transform, if it has any
+    # Returns the node paths of the removed bodies
+    def remove(self, transform):
+        if transform not in self.transforms:
+            return []
+        removed = [body_path for body_path, body_transform in zip(self.body_paths, self.transforms)
+                   if body_transform is transform]
+        kept = [i for i in range(len(self.transforms)) if self.transforms[i] is not transform]
+        self.body_paths = [self.body_paths[i] for i in kept]
+        self.transforms = [self.transforms[i] for i in kept]
+        self.kinematic = [self.kinematic[i] for i in kept]
+        self.layout_dirty = True
+        return removed
+
+    # Removes all rigid bodies
+    def clear(self):
+        self.body_paths = []
+        self.transforms = []
+        self.kinematic = []
+        self.layout_dirty = True
+        self.synced_bodies = 0
+        self.skipped_bodies = 0
+
+    # Splits bodies into kinematic and dynamic ones, and groups dynamic bodies by how many of their ancestors
+    # are dynamic bodies, so each group can be written after the groups its parent matrices depend on
+    def build(self):
+        self.layout_dirty = False
+
+        dynamic = [i for i in range(len(self.transforms)) if not self.kinematic[i]]
+        self.dynamic_paths = [self.body_paths[i] for i in dynamic]
+        self.dynamic_nodes = [path.node() for path in self.dynamic_paths]
+        self.dynamic_static = np.array([node.isStatic() for node in self.dynamic_nodes], dtype=bool)
+        self.dynamic_scales = np.array([tuple(path.getScale()) for path in self.dynamic_paths]).reshape(-1, 3)
+        dynamic_transforms = set(self.transforms[i] for i in dynamic)
+        level_indices = {}
+        for i, body in enumerate(dynamic):
+            depth = 0
+            parent = self.transforms[body].parent
+            while parent is not None:
+                if parent in dynamic_transforms:
+                    depth += 1
+                parent = parent.parent
+            level_indices.setdefault(depth, []).append(i)
+        self.levels = [(np.array(level_indices[depth]), [self.transforms[dynamic[i]] for i in level_indices[depth]])
+                       for depth in sorted(level_indices)]
+
+        kinematic = [i for i in range(len(self.transforms)) if self.kinematic[i]]
+        self.kinematic_paths = [self.body_paths[i] for i in kinematic]
+        self.kinematic_transforms = [self.transforms[i] for i in kinematic]
+        self.kinematic_static = np.array([path.node().isStatic() for path in self.kinematic_paths], dtype=bool)
+        self.kinematic_matrices = np.full((len(kinematic), 4, 4), np.nan)
+
+    # Moves kinematic bodies to the world transforms of their nodes
+    def push_kinematic(self):
+        if self.layout_dirty:
+            self.build()
+        if len(self.kinematic_paths) == 0:
+            return
+
+        # Static bodies are never moved by the physics engine, so they only need to be pushed when their node moved
+        matrices = np.array([transform.get_world_matrix_view() for transform in self.kinematic_transforms])
+        changed = np.flatnonzero(~self.kinematic_static | (matrices != self.kinematic_matrices).any(axis=(1, 2)))
+        self.kinematic_matrices = matrices
+        if len(changed) == 0:
+            return
+
+        trans, rot, scale = decompose_matrices(matrices[changed])
+        rot = np.degrees(rot)
+        for i, (x, y, z), (rot_x, rot_y, rot_z), (scale_x, scale_y, scale_z) in zip(changed.tolist(), trans.tolist(),
+                                                                                     rot.tolist(), scale.tolist()):
+            self.kinematic_paths[i].setPosHprScale(x, y, z, rot_y, rot_x, rot_z, scale_x, scale_y, scale_z)
+
+    # Moves the nodes of dynamic bodies to the transforms of their bodies
+    # Bullet doesn't move sleeping or static bodies, so their nodes are skipped
+    # Static bodies never move, so they aren't counted as skipped
+    def pull_dynamic(self):
+        if self.layout_dirty:
+            self.build()
+        if len(self.dynamic_paths) == 0:
+            return
+
+        active = np.array([node.isActive() for node in self.dynamic_nodes], dtype=bool) & ~self.dynamic_static
+        active_indices = np.flatnonzero(active)
+        self.synced_bodies += len(active_indices)
+        self.skipped_bodies += len(active) - len(active_indices) - int(self.dynamic_static.sum())
+        if len(active_indices) == 0:
+            return
+
+        dynamic_paths = self.dynamic_paths
+        states = np.array([(*dynamic_paths[i].getPos(), *dynamic_paths[i].getQuat()) for i in active_indices.tolist()])
+        world_matrices = np.empty((len(active), 4, 4))
+        world_matrices[active_indices] = compose_body_matrices(states[:, :3], states[:, 3:],
+                                                               self.dynamic_scales[active_indices])
+        for indices, transforms in self.levels:
+            level_active = active[indices]
+            if not level_active.all():
+                if not level_active.any():
+                    continue
+                indices = indices[level_active]
+                transforms = [transform for transform, is_active in zip(transforms, level_active.tolist())
+                              if is_active]
+            parent_matrices = np.array([transform.get_parent_matrix_view() for transform in transforms])
+            local_matrices = np.matmul(np.linalg.inv(parent_matrices), world_matrices[indices])
+            trans, rot, scale = decompose_matrices(local_matrices)
+            for transform, body_trans, body_rot, body_scale in zip(transforms, trans, rot, scale):
+                transform.trans[:] = body_trans
+                transform.rot[:] = body_rot
+                transform.scale[:] = body_scale
+                transform.update()
+
+
+# Returns the matrices of rows of positions, quaternions (w, x, y, z) and scales of rigid bodies
+def compose_body_matrices(positions, quats, scales):
+    w, x, y, z = quats.T
+    matrices = np.zeros((len(positions), 4, 4))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - z * w)
+    matrices[:, 0, 2] = 2 * (x * z + y * w)
+    matrices[:, 1, 0] = 2 * (x * y + z * w)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - x * w)
+    matrices[:, 2, 0] = 2 * (x * z - y * w)
+    matrices[:, 2, 1] = 2 * (y * z + x * w)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    matrices[:, :3, :3] *= scales[:, np.newaxis, :]
+    matrices[:, :3, 3] = positions
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
 class RaycastResult:
 
     def __init__(self):
         self.hit_node_id = None
         self.hit_point = None
+
+
+# Results of a batch of raycasts
+# "hits" holds whether each ray hit anything
+# The other arrays have one row per hit, with "ray_indices" holding the ray each row belongs to
+# For closest hit raycasts, there is one row per ray, and rows of rays that missed have an infinite distance
+class RaycastBatchResult:
+
+    def __init__(self, num_rows):
+        self.hits = np.zeros(num_rows, dtype=bool)
+        self.ray_indices = np.arange(num_rows)
+        self.points = np.zeros((num_rows, 3), dtype=np.float32)
+        self.normals = np.zeros((num_rows, 3), dtype=np.float32)
+        self.distances = np.full(num_rows, np.inf, dtype=np.float32)
+        self.node_ids = np.full(num_rows, None, dtype=object)
@@ -6,30 +6,42 @@ Actually plays out trials.
 import json
 from pathlib import Path
 import sys
+import time
 import yaml
 from direct.showbase.ShowBase import ShowBase
 from direct.showbase.ShowBaseGlobal import globalClock
 from direct.task.Task import Task
-from panda3d.bullet import BulletWorld
-from panda3d.core import PandaNode, DirectionalLight, LVector3f
+from panda3d.core import DirectionalLight
 from tools.envedit.camera_controller import CameraController
 from tools.envedit.edenv_component import EComponent
 from tools.envedit.floor_node import FloorNode
 from tools.envedit.gizmos.gizmo_system import GizmoSystem
-from tools.envedit.graph_node import GraphNode
-from tools.run import event
-from tools.run.event import register_component
-from tools.run.trial import Trial
+from tools.run.shape_cache import ShapeCache
+from tools.run.simulation import Simulation
 
 
 class Player(ShowBase):
 
-    def __init__(self, env_name, trial_data, headless=False):
-        self.manually_quit = True
+    # If "fixed_dt" is given, headless trials step the physics engine by "fixed_dt" split into "substeps" steps,
+    # as fast as possible
+    # If "use_transform_store" is True, the scene's transforms are kept in a TransformStore and updated in bulk
+    # If "merge_static_bodies" is True, static rigid bodies are merged into one body when the environment is loaded
+    def __init__(self, env_name, headless=False, fixed_dt=None, substeps=1, use_transform_store=False,
+                 merge_static_bodies=False):
+        self.headless = headless
+        self.fixed_dt = fixed_dt
+        self.substeps = substeps
+        self.use_transform_store = use_transform_store
+        self.merge_static_bodies = merge_static_bodies
+        self.simulation = None
+        self.trial_steps = 0            # Number of frames simulated in the last trial
+        self.trial_time = 0             # Seconds spent simulating the last trial
+        self.trial_awake_bodies = 0     # Number of rigid body updates made in the last trial
+        self.trial_sleeping_bodies = 0  # Number of sleeping rigid body updates skipped in the last trial
         try:
             ShowBase.__init__(self, windowType="none" if headless else "onscreen")
         except:
-            self.trial_finished_callback()
+            sys.exit()
 
         # Allows importing components from project folder
         sys.path.append(".")
@@ -37,14 +49,12 @@ class Player(ShowBase):
         # Initial scene setup
         self.disableMouse()
         self.setBackgroundColor(0.15, 0.15, 0.15, 1)
-        EComponent.panda_root_node = self.render.attach_new_node(PandaNode("Root"))
         EComponent.base = self
 
         # Attach a directional light to the camera
         if not headless:
             self.dir_light = DirectionalLight("cam_dir_light")
-            dir_light_path = self.camera.attach_new_node(self.dir_light)
-            EComponent.panda_root_node.setLight(dir_light_path)
+            self.dir_light_path = self.camera.attach_new_node(self.dir_light)
 
         # Read the project config file
         config_path = Path("project.yaml")
@@ -66,79 +76,69 @@ class Player(ShowBase):
         if not headless:
             self.cam_controller = CameraController(self, self.render, self.camera)
 
-        # Set up physics system
-        self.physics_world = BulletWorld()
-        self.physics_world.setGravity(LVector3f(0, 0, -9.81))
-        EComponent.physics_world = self.physics_world
-        self.taskMgr.add(self.physics_task, "physics_task")
-
-        # Load environment
+        # Read the environment once, every trial starts from it
         with open(env_name + ".json", "r") as file:
-            scene_dict = json.load(file)
-            self.root_node = GraphNode.dict_to_scene_graph(scene_dict, use_gui=False)
-
-            trial = Trial()
-            trial.data = trial_data
-            trial.trial_finished_callback = self.trial_finished_callback
-            self.setup_node(self.root_node, trial)
-
-        # Set up update task
-        self.taskMgr.add(self.update_task, "update_task")
+            self.scene_dict = json.load(file)
 
-    # Sets up all nodes
-    def setup_node(self, node, trial):
-        for component in node.data:
-            # Register components to event system
-            register_component(component)
+    # Restores the environment to its initial state for a new trial
+    def reset(self, trial_data):
+        GizmoSystem.gizmos = [None for _ in range(256)]
+        ShapeCache.reset_counts()
+        if self.simulation is None:
+            self.simulation = Simulation(self.scene_dict, trial_data, self.render,
+                                         use_transform_store=self.use_transform_store,
+                                         merge_static_bodies=self.merge_static_bodies)
+            self.simulation.finished_callback = self.trial_finished_callback
+            self.event_bus = self.simulation.event_bus
+            if not self.headless:
+                self.simulation.panda_root_node.setLight(self.dir_light_path)
+        else:
+            self.simulation.reset(trial_data)
+        self.root_node = self.simulation.root_node
+        self.physics_world = self.simulation.physics_world
+
+    # Runs a trial until it finishes and returns its trial data
+    def run_trial(self, trial_data):
+        self.reset(trial_data)
+        self.trial_steps = 0
+        start_time = time.perf_counter()
+
+        if self.headless and self.fixed_dt is not None:
+            # Step without the task manager, so there is no frame pacing or render pass
+            while not self.simulation.finished:
+                self.simulation.step(self.fixed_dt, self.substeps)
+                self.trial_steps += 1
+        else:
+            # Set up physics and update tasks
+            self.taskMgr.add(self.physics_task, "physics_task")
+            self.taskMgr.add(self.update_task, "update_task")
 
-            # Set trial property of components
-            component.trial = trial
+            while not self.simulation.finished:
+                self.taskMgr.step()
 
-        # Start all the components
-        node.start_components()
+        self.trial_time = time.perf_counter() - start_time
+        self.trial_awake_bodies = self.simulation.physics.bodies.synced_bodies
+        self.trial_sleeping_bodies = self.simulation.physics.bodies.skipped_bodies
+        return trial_data
 
-        # Propagate to children
-        for child in node.children:
-            self.setup_node(child, trial)
+    # Removes a node and its children from the scene, unregistering their components
+    def remove_node(self, node):
+        self.simulation.remove_node(node)
 
     # Updates components every frame
     def update_task(self, task):
-        event.send_event("main", "update")
+        self.simulation.update()
+        self.trial_steps += 1
         return Task.cont
 
     # Updates the physics engine
     def physics_task(self, task):
         dt = globalClock.getDt()
-        self.physics_world.doPhysics(dt)
+        self.simulation.step_physics(dt)
         return Task.cont
 
     # Called when trial is finished
     def trial_finished_callback(self):
-        self.manually_quit = False
         self.taskMgr.remove("update_task")
         self.taskMgr.remove("physics_task")
-        event.COMPONENTS.clear()
-        GizmoSystem.gizmos = [None for _ in range(256)]
-        sys.exit()
 
-
-def run(env_name, trial_data):
-    app = Player(env_name, trial_data, headless=False)
-    try:
-        app.run()
-    except SystemExit as e:
-        if app.manually_quit:
-            sys.exit()
-        else:
-            app.destroy()
-
-
-def run_headless(env_name, trial_data):
-    app = Player(env_name, trial_data, headless=True)
-    try:
-        app.run()
-    except SystemExit as e:
-        if app.manually_quit:
-            sys.exit()
-        else:
-            app.destroy()
@@ -4,13 +4,16 @@ Main CLI app for EDEnv.
 @author Ben Giacalone
 """
 import importlib
+import multiprocessing
 import sys
 import time
+from collections import deque
 
 import click
 import yaml
 
-from tools.run import player
+from tools.run import player, worker
+from tools.run.vector_player import VectorPlayer
 
 
 @click.command()
@@ -19,7 +22,11 @@ from tools.run import player
 @click.option("-c", "--config", type=click.File('r'))
 @click.option("-t", "--trials", type=int, default=-1)
 @click.option("-v", "--visualize", type=int, default=1)
-def run(interactive, environment, config, trials, visualize):
+@click.option("-n", "--num-envs", type=int, default=1, help="Number of headless environment copies to run in lockstep.")
+@click.option("-w", "--workers", type=int, default=1, help="Number of processes to run headless trials in.")
+@click.option("-d", "--fixed-dt", type=float, default=None, help="Seconds per frame to step headless trials by, as fast as possible.")
+@click.option("-s", "--substeps", type=int, default=1, help="Number of physics steps per frame when using a fixed dt.")
+def run(interactive, environment, config, trials, visualize, num_envs, workers, fixed_dt, substeps):
     # Allow importing project scripts from project folder
     sys.path.append(".")
 
@@ -33,16 +40,26 @@ def run(interactive, environment, config, trials, visualize):
         cfg_pj_script = "project_scripts." + config_file["project_script"] if "project_script" in config_file else ""
         cfg_trials = config_file["trials"] if "trials" in config_file else -1
         cfg_visualize = config_file["visualize"] if "visualize" in config_file else 1
-        run_trials(cfg_environment, cfg_trials, cfg_visualize, cfg_pj_script)
+        cfg_num_envs = config_file["num_envs"] if config_file.get("num_envs") is not None else num_envs
+        cfg_workers = config_file["workers"] if config_file.get("workers") is not None else workers
+        cfg_fixed_dt = config_file["fixed_dt"] if config_file.get("fixed_dt") is not None else fixed_dt
+        cfg_substeps = config_file["substeps"] if config_file.get("substeps") is not None else substeps
+        run_trials(cfg_environment, cfg_trials, cfg_visualize, cfg_pj_script, cfg_num_envs, cfg_workers,
+                   cfg_fixed_dt, cfg_substeps)
     else:
         if environment == "":
             return
-        run_trials(environment, trials, visualize)
+        run_trials(environment, trials, visualize, num_envs=num_envs, workers=workers, fixed_dt=fixed_dt,
+                   substeps=substeps)
 
 
 # Runs the player n number of trials
 # If "trials" is -1, run forever
-def run_trials(environment, trials, visualize, pj_script=None):
+# If "num_envs" is greater than 1, trials are run headless in batches of "num_envs" environment copies
+# If "workers" is greater than 1, trials are run headless in "workers" processes
+# If "fixed_dt" is given, headless trials are stepped by "fixed_dt" split into "substeps" physics steps, as fast as
+# possible, and the achieved frames per second are reported
+def run_trials(environment, trials, visualize, pj_script=None, num_envs=1, workers=1, fixed_dt=None, substeps=1):
     # Create project script
     project_script = None
     if pj_script is not None:
@@ -60,7 +77,13 @@ def run_trials(environment, trials, visualize, pj_script=None):
 
         project_script.start_run()
 
-    if trials == -1:
+    stats = StepStats()
+    if workers > 1:
+        run_parallel_trials(environment, trials, workers, project_script, fixed_dt, substeps, stats)
+    elif num_envs > 1:
+        run_vectorized_trials(environment, trials, num_envs, project_script, fixed_dt, substeps, stats)
+    elif trials == -1:
+        app = None
         i = 0
         interrupted = False
         while True:
@@ -73,7 +96,10 @@ def run_trials(environment, trials, visualize, pj_script=None):
                 project_script.start_trial(trial_data)
 
             try:
-                run_player(environment, trial_data, i % visualize != 0)
+                app = get_player(app, environment, i % visualize != 0, fixed_dt, substeps)
+                app.run_trial(trial_data)
+                if app.headless:
+                    stats.add(app.trial_steps, app.trial_time, app.trial_awake_bodies, app.trial_sleeping_bodies)
             except SystemExit as e:
                 interrupted = True
 
@@ -81,7 +107,10 @@ def run_trials(environment, trials, visualize, pj_script=None):
                 project_script.finish_trial(trial_data)
 
             i = (i + 1) % visualize
+        if app is not None:
+            app.destroy()
     else:
+        app = None
         interrupted = False
         for i in range(trials):
             if interrupted:
@@ -93,24 +122,112 @@ def run_trials(environment, trials, visualize, pj_script=None):
                 project_script.start_trial(trial_data)
 
             try:
-                run_player(environment, trial_data, i % visualize != 0)
+                app = get_player(app, environment, i % visualize != 0, fixed_dt, substeps)
+                app.run_trial(trial_data)
+                if app.headless:
+                    stats.add(app.trial_steps, app.trial_time, app.trial_awake_bodies, app.trial_sleeping_bodies)
             except SystemExit as e:
                 interrupted = True
 
             if project_script is not None:
                 project_script.finish_trial(trial_data)
+        if app is not None:
+            app.destroy()
+
+    if fixed_dt is not None and stats.steps > 0:
+        click.echo(f"Simulated {stats.steps} headless frames at {stats.steps_per_second():.0f} frames per second.")
+        if stats.awake_bodies + stats.sleeping_bodies > 0:
+            click.echo(f"Updated {stats.awake_bodies / stats.steps:.1f} awake rigid bodies per frame, skipped "
+                       f"{stats.sleeping_bodies / stats.steps:.1f} sleeping ones.")
 
     if project_script is not None:
         project_script.finish_run()
 
 
-# Runs the player and returns trial data
-def run_player(environment, trial_data, headless=False):
-    if headless:
-        player.run_headless(environment, trial_data)
+# Running totals of headless frames simulated and seconds spent simulating them
+# Rigid body updates are counted too, split into ones made for awake bodies and ones skipped for resting bodies
+class StepStats:
+
+    def __init__(self):
+        self.steps = 0
+        self.time = 0
+        self.awake_bodies = 0
+        self.sleeping_bodies = 0
+
+    def add(self, steps, seconds, awake_bodies=0, sleeping_bodies=0):
+        self.steps += steps
+        self.time += seconds
+        self.awake_bodies += awake_bodies
+        self.sleeping_bodies += sleeping_bodies
+
+    def steps_per_second(self):
+        return self.steps / self.time if self.time > 0 else 0
+
+
+# Runs trials in batches of environment copies stepping in lockstep
+def run_vectorized_trials(environment, trials, num_envs, project_script=None, fixed_dt=None, substeps=1, stats=None):
+    app = VectorPlayer(environment, num_envs, fixed_dt, substeps)
+    i = 0
+    while trials == -1 or i < trials:
+        batch_size = num_envs if trials == -1 else min(num_envs, trials - i)
+        trial_data_list = [{} for _ in range(batch_size)]
+
+        if project_script is not None:
+            for trial_data in trial_data_list:
+                project_script.start_trial(trial_data)
+
+        try:
+            app.run_trials(trial_data_list)
+        except SystemExit as e:
+            break
+        if stats is not None:
+            stats.add(app.trial_steps, app.trial_time, app.trial_awake_bodies, app.trial_sleeping_bodies)
+
+        if project_script is not None:
+            for trial_data in trial_data_list:
+                project_script.finish_trial(trial_data)
+
+        i += batch_size
+    app.destroy()
+
+
+# Runs trials in a pool of worker processes
+# Trial data is streamed back and "finish_trial" is called in the order trials were started
+# Frames per second are summed over the workers' simulation time, so they measure throughput per process
+def run_parallel_trials(environment, trials, workers, project_script=None, fixed_dt=None, substeps=1, stats=None):
+    pool = multiprocessing.Pool(workers, initializer=worker.init_worker, initargs=(environment, fixed_dt, substeps))
+    pending = deque()
+    i = 0
+    try:
+        while trials == -1 or i < trials or len(pending) > 0:
+            # Keep every worker busy, with one trial queued behind it
+            while len(pending) < workers * 2 and (trials == -1 or i < trials):
+                trial_data = {}
+                if project_script is not None:
+                    project_script.start_trial(trial_data)
+                pending.append(pool.apply_async(worker.run_trial, (trial_data,)))
+                i += 1
+
+            trial_data, trial_steps, trial_time, awake_bodies, sleeping_bodies = pending.popleft().get()
+            if stats is not None:
+                stats.add(trial_steps, trial_time, awake_bodies, sleeping_bodies)
+            if project_script is not None:
+                project_script.finish_trial(trial_data)
+    except KeyboardInterrupt as e:
+        pool.terminate()
     else:
-        player.run(environment, trial_data)
-    return trial_data
+        pool.close()
+    pool.join()
+
+
+# Returns a player for the environment
+# The previous player is reused if it runs in the same mode, so trials don't pay for starting up Panda3D
+def get_player(app, environment, headless, fixed_dt=None, substeps=1):
+    if app is not None and app.headless == headless:
+        return app
+    if app is not None:
+        app.destroy()
+    return player.Player(environment, headless, fixed_dt, substeps)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+"""
+Serves environment copies to agents in other processes.
+
+Every message starts with a header of a message type (or status, in responses), an environment copy index and a
+payload length, followed by the payload.
+A payload is the length of its JSON part, the JSON part, then the raw bytes of every NumPy array in it. Numeric arrays
+are replaced in the JSON part by {"__ndarray__": <index of the array>} and sent as a header of their dtype and number
+of dimensions, their shape and "ndarray.tobytes()". NumPy scalars and other arrays are sent as numbers and lists.
+
+@author Ben Giacalone
+"""
+import asyncio
+import json
+import socket
+import struct
+import sys
+
+import click
+import numpy as np
+
+from tools.run.vector_player import VectorPlayer
+
+HEADER = struct.Struct("<BHI")
+JSON_LENGTH = struct.Struct("<I")
+ARRAY_HEADER = struct.Struct("<8sB")   # Dtype string (e.g. "<f4") and number of dimensions, followed by the shape
+ARRAY_KINDS = "biufc"                   # Kinds of dtypes sent as raw bytes: booleans, integers, floats and complex
+
+# Message types
+RESET = 0           # Payload is trial data, responds with the first observation
+STEP = 1            # Payload is actions, responds with whether the trial finished
+OBSERVE = 2         # Responds with the current observation
+TRIAL_DATA = 3      # Responds with the trial data
+
+# Response statuses
+STATUS_OK = 0
+STATUS_ERROR = 1    # Payload is the error message
+
+
+# Returns the encoding of a payload
+def encode_payload(payload):
+    arrays = []
+    text = json.dumps(payload, separators=(",", ":"), default=lambda value: encode_value(value, arrays)).encode()
+    parts = [JSON_LENGTH.pack(len(text)), text]
+    for array in arrays:
+        parts.append(ARRAY_HEADER.pack(array.dtype.str.encode(), array.ndim))
+        parts.append(struct.pack(f"<{array.ndim}I", *array.shape))
+        parts.append(array.tobytes())
+    return b"".join(parts)
+
+
+# Converts values the json module can't encode
+# Numeric NumPy arrays are added to "arrays" and replaced by their index, other arrays become (nested) lists and NumPy
+# scalars become Python numbers
+def encode_value(value, arrays):
+    if isinstance(value, np.ndarray) and value.dtype.kind in ARRAY_KINDS:
+        arrays.append(value)
+        return {"__ndarray__": len(arrays) - 1}
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Returns the payload encoded in "data"
+# Arrays share memory with "data", so they are only writable if "data" is
+def decode_payload(data):
+    (text_length,) = JSON_LENGTH.unpack_from(data)
+    offset = JSON_LENGTH.size + text_length
+    text = bytes(data[JSON_LENGTH.size:offset])
+
+    arrays = []
+    while offset < len(data):
+        dtype, ndim = ARRAY_HEADER.unpack_from(data, offset)
+        offset += ARRAY_HEADER.size
+        shape = struct.unpack_from(f"<{ndim}I", data, offset)
+        offset += 4 * ndim
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        count = int(np.prod(shape))
+        arrays.append(np.frombuffer(data, dtype, count, offset).reshape(shape))
+        offset += count * dtype.itemsize
+
+    return json.loads(text, object_hook=lambda value: decode_value(value, arrays))
+
+
+# Replaces the placeholders of arrays in decoded JSON objects by the arrays
+def decode_value(value, arrays):
+    if len(value) == 1 and "__ndarray__" in value:
+        return arrays[value["__ndarray__"]]
+    return value
+
+
+class EnvironmentServer:
+
+    def __init__(self, env_name, num_envs, dt=1 / 60, substeps=1):
+        self.group = VectorPlayer(env_name, num_envs, dt, substeps)
+        self.group.reset([{} for _ in range(num_envs)])
+        self.step_requests = []
+        self.steps_scheduled = False
+
+    # Serves clients on a Unix domain socket
+    async def serve_unix(self, path):
+        server = await asyncio.start_unix_server(self.handle_client, path)
+        async with server:
+            await server.serve_forever()
+
+    # Serves clients on a TCP socket
+    async def serve_tcp(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    # Answers requests from a client until it disconnects
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                message_type, env_index, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+                # Copied into a bytearray, so arrays in the payload are writable
+                payload = decode_payload(bytearray(await reader.readexactly(length))) if length > 0 else None
+
+                # Results that can't be encoded are reported to the client like any other error
+                try:
+                    result = await self.handle_request(message_type, env_index, payload)
+                    data = encode_payload(result)
+                    status = STATUS_OK
+                except Exception as e:
+                    data = encode_payload(f"{type(e).__name__}: {e}")
+                    status = STATUS_ERROR
+
+                writer.write(HEADER.pack(status, env_index, len(data)) + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # Runs a request on an environment copy and returns the result
+    async def handle_request(self, message_type, env_index, payload):
+        simulation = self.group.simulations[env_index]
+        if message_type == RESET:
+            simulation.reset({} if payload is None else payload)
+            return simulation.observe()
+        if message_type == STEP:
+            return await self.request_step(env_index, payload)
+        if message_type == OBSERVE:
+            return simulation.observe()
+        if message_type == TRIAL_DATA:
+            return simulation.trial.data
+        raise ValueError(f"Unknown message type {message_type}.")
+
+    # Queues a step of an environment copy, so steps requested in the same tick are run together
+    def request_step(self, env_index, actions):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.step_requests.append((env_index, actions, future))
+        if not self.steps_scheduled:
+            self.steps_scheduled = True
+            loop.call_soon(self.run_steps)
+        return future
+
+    # Steps every environment copy with a queued request once
+    # Copies with more than one queued request are stepped again on the next tick
+    def run_steps(self):
+        step_requests = self.step_requests
+        self.step_requests = []
+        self.steps_scheduled = False
+
+        stepped = set()
+        for env_index, actions, future in step_requests:
+            if env_index in stepped:
+                self.step_requests.append((env_index, actions, future))
+                continue
+            stepped.add(env_index)
+
+            # The client disconnected while waiting
+            if future.cancelled():
+                continue
+
+            simulation = self.group.simulations[env_index]
+            try:
+                if not simulation.finished:
+                    if actions is not None:
+                        simulation.act(actions)
+                    simulation.step(self.group.fixed_dt, self.group.substeps)
+                future.set_result(simulation.finished)
+            except Exception as e:
+                future.set_exception(e)
+
+        if len(self.step_requests) > 0:
+            self.steps_scheduled = True
+            asyncio.get_running_loop().call_soon(self.run_steps)
+
+
+class EnvironmentClient:
+
+    # If "address" is a string, connects to a Unix domain socket at that path, otherwise to a (host, port) tuple
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.connect(address)
+
+    # Starts a new trial on an environment copy and returns the first observation
+    def reset(self, env_index=0, trial_data=None):
+        return self.request(RESET, env_index, trial_data)
+
+    # Advances an environment copy by one tick and returns whether the trial has finished
+    def step(self, env_index=0, actions=None):
+        return self.request(STEP, env_index, actions)
+
+    # Returns the current observation of an environment copy
+    def observe(self, env_index=0):
+        return self.request(OBSERVE, env_index)
+
+    # Returns the trial data of an environment copy
+    def trial_data(self, env_index=0):
+        return self.request(TRIAL_DATA, env_index)
+
+    # Sends a request and waits for its result
+    def request(self, message_type, env_index, payload=None):
+        data = b"" if payload is None else encode_payload(payload)
+        self.socket.sendall(HEADER.pack(message_type, env_index, len(data)) + data)
+
+        status, _, length = HEADER.unpack(self.receive(HEADER.size))
+        result = decode_payload(self.receive(length))
+        if status != STATUS_OK:
+            raise RuntimeError(result)
+        return result
+
+    # Reads exactly "size" bytes from the socket
+    def receive(self, size):
+        data = bytearray(size)
+        view = memoryview(data)
+        while size > 0:
+            received = self.socket.recv_into(view, size)
+            if received == 0:
+                raise ConnectionError("Environment server closed the connection.")
+            view = view[received:]
+            size -= received
+        return data
+
+    def close(self):
+        self.socket.close()
+
+
+@click.command()
+@click.option("-e", "--environment", type=str, required=True)
+@click.option("-n", "--num-envs", type=int, default=1, help="Number of environment copies to serve.")
+@click.option("-d", "--fixed-dt", type=float, default=1 / 60, help="Seconds per step.")
+@click.option("-s", "--substeps", type=int, default=1, help="Number of physics steps per step.")
+@click.option("-u", "--unix-socket", type=str, default=None, help="Path of a Unix domain socket to serve on.")
+@click.option("--host", type=str, default="127.0.0.1")
+@click.option("--port", type=int, default=7070)
+def serve(environment, num_envs, fixed_dt, substeps, unix_socket, host, port):
+    # Allow importing components from project folder
+    sys.path.append(".")
+
+    server = EnvironmentServer(environment, num_envs, fixed_dt, substeps)
+    try:
+        if unix_socket is not None:
+            asyncio.run(server.serve_unix(unix_socket))
+        else:
+            asyncio.run(server.serve_tcp(host, port))
+    except KeyboardInterrupt as e:
+        pass
+    server.group.destroy()
+
+
+if __name__ == "__main__":
+    serve()
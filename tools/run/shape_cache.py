@@ -0,0 +1,63 @@
+"""
+Shares Bullet collision shapes between colliders with the same parameters.
+
+@author Ben Giacalone
+"""
+from collections import OrderedDict
+
+from panda3d.bullet import BulletBoxShape, BulletSphereShape
+from panda3d.core import LVector3f
+
+
+class ShapeCache:
+    MAX_CACHED = 1024
+    shapes = OrderedDict()  # Maps (shape type, shape parameters, body scale) to shapes, least recently used first
+    uses = {}               # Maps the keys of cached shapes to the number of colliders given them since the last reset
+    hits = 0                # Number of times a cached shape was reused since the last reset
+    misses = 0              # Number of shapes created since the last reset
+
+    # Returns a box shape with half extents "half_extents", for a body with scale "scale"
+    # Panda rescales the shapes of scaled bodies in place, so shapes are only shared by bodies with the same scale
+    @staticmethod
+    def get_box(half_extents, scale):
+        half_extents = tuple(float(extent) for extent in half_extents)
+        return ShapeCache.get_shape(("box", half_extents, tuple(scale)), lambda: BulletBoxShape(LVector3f(*half_extents)))
+
+    # Returns a sphere shape with radius "radius", for a body with scale "scale"
+    @staticmethod
+    def get_sphere(radius, scale):
+        radius = float(radius)
+        return ShapeCache.get_shape(("sphere", radius, tuple(scale)), lambda: BulletSphereShape(radius))
+
+    # Returns the cached shape of "key", calling "create_shape" to create it if it isn't cached
+    # Once more than MAX_CACHED shapes are cached, the least recently used one is dropped, bodies keep their shapes
+    @staticmethod
+    def get_shape(key, create_shape):
+        shape = ShapeCache.shapes.get(key)
+        if shape is None:
+            shape = create_shape()
+            ShapeCache.shapes[key] = shape
+            ShapeCache.misses += 1
+            if len(ShapeCache.shapes) > ShapeCache.MAX_CACHED:
+                old_key, _ = ShapeCache.shapes.popitem(last=False)
+                ShapeCache.uses.pop(old_key, None)
+        else:
+            ShapeCache.shapes.move_to_end(key)
+            ShapeCache.hits += 1
+        ShapeCache.uses[key] = ShapeCache.uses.get(key, 0) + 1
+        return shape
+
+    # Resets the use and hit counts, keeping the cached shapes
+    # Called by the players before each trial or batch of trials, so the counts cover every environment copy in it
+    @staticmethod
+    def reset_counts():
+        ShapeCache.uses.clear()
+        ShapeCache.hits = 0
+        ShapeCache.misses = 0
+
+    # Removes all cached shapes and resets the counts
+    # Bodies keep the shapes they were given
+    @staticmethod
+    def clear():
+        ShapeCache.shapes.clear()
+        ShapeCache.reset_counts()
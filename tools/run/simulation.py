@@ -0,0 +1,184 @@
+"""
+A single copy of an environment, with its own physics world, event bus and scene graph.
+
+@author Ben Giacalone
+"""
+import copy
+
+from panda3d.bullet import BulletWorld
+from panda3d.core import PandaNode, LVector3f
+from tools.envedit.edenv_component import EComponent
+from tools.envedit.graph_node import GraphNode
+from tools.envedit.transform_store import TransformStore
+from tools.run.event import EventBus
+from tools.run.physics import Physics
+from tools.run.trial import Trial
+
+
+class Simulation:
+
+    # If "use_transform_store" is True, the scene's transforms are kept in a TransformStore and updated in bulk
+    # If "merge_static_bodies" is True, static rigid bodies are merged into one body when the environment is loaded
+    def __init__(self, scene_dict, trial_data, parent_node, name="Root", use_transform_store=False,
+                 merge_static_bodies=False):
+        self.scene_dict = scene_dict
+        self.root_node = None
+        self.use_transform_store = use_transform_store
+        self.merge_static_bodies = merge_static_bodies
+        self.transform_store = None
+        self.snapshot = None                # Initial state of the scene graph, restored when the simulation is reset
+        self.finished = False
+        self.finished_callback = None       # Called when the trial is finished
+
+        # Set up panda node that holds the environment's objects
+        self.panda_root_node = parent_node.attach_new_node(PandaNode(name))
+
+        # Set up event system
+        self.event_bus = EventBus()
+
+        # Set up physics system
+        self.physics_world = None
+        self.physics = None
+        self.create_physics_world()
+
+        # Set up trial
+        self.trial = Trial()
+        self.trial.trial_finished_callback = self.trial_finished_callback
+
+        # Load environment
+        self.reset(trial_data)
+
+    # Restores the environment to its initial state for a new trial
+    # The scene graph is built once and restored from a snapshot afterwards, physics bodies are rebuilt in a new
+    # physics world
+    def reset(self, trial_data):
+        self.clear_physics()
+        self.create_physics_world()
+        self.finished = False
+        self.trial.data = trial_data
+
+        self.activate()
+        if self.snapshot is None:
+            self.root_node = GraphNode.dict_to_scene_graph(copy.deepcopy(self.scene_dict), use_gui=False)
+            self.snapshot = self.root_node.snapshot()
+        else:
+            self.snapshot.restore()
+        if self.use_transform_store and self.transform_store is None:
+            self.transform_store = TransformStore(self.root_node)
+        self.setup_node(self.root_node)
+        if self.merge_static_bodies:
+            self.physics.merge_static_bodies(self.panda_root_node, self.panda_root_node.name + "_static_rigid_body")
+
+    # Replaces the physics world with an empty one
+    # Bullet keeps broadphase and contact pair caches after bodies are removed, which change how later trials play out,
+    # so trials with the same inputs are only reproducible if each one starts from a new world
+    def create_physics_world(self):
+        self.physics_world = BulletWorld()
+        self.physics_world.setGravity(LVector3f(0, 0, -9.81))
+        self.physics = Physics(self.physics_world)
+
+    # Makes this simulation the one components and module level event functions refer to
+    # Called before the simulation runs any component code, so several simulations can take turns
+    def activate(self):
+        EComponent.panda_root_node = self.panda_root_node
+        EComponent.physics_world = self.physics_world
+        EComponent.shared_physics = self.physics
+        EventBus.active = self.event_bus
+
+    # Sets up a node and its children
+    def setup_node(self, node):
+        for curr_node in node.get_subtree():
+            for component in curr_node.data:
+                # Register components to event system
+                self.event_bus.register(component)
+                component.event_bus = self.event_bus
+
+                # Set trial and physics properties of components
+                component.trial = self.trial
+                component.physics = self.physics
+
+            # Start all the components
+            curr_node.start_components()
+
+    # Removes a node and its children from the scene, unregistering their components
+    def remove_node(self, node):
+        if node.parent is not None:
+            node.parent.remove_child(node)
+        else:
+            self.unregister_node(node)
+
+    # Unregisters the components of a node and its children from the event system, and removes their rigid bodies
+    # from the physics world
+    # GraphNode.remove_child does the same for nodes removed by components
+    def unregister_node(self, node):
+        for curr_node in node.get_subtree():
+            for component in curr_node.data:
+                component.on_remove()
+
+    # Advances the physics engine
+    # If "substeps" is given, the world is advanced by exactly "substeps" fixed steps of dt / substeps
+    # Kinematic bodies are moved to their nodes before the step, and nodes are moved to dynamic bodies after it
+    def step_physics(self, dt, substeps=None):
+        self.activate()
+        self.physics.bodies.push_kinematic()
+        if substeps is None:
+            self.physics_world.doPhysics(dt)
+        else:
+            self.physics_world.doPhysics(dt, substeps, dt / substeps)
+        self.physics.bodies.pull_dynamic()
+        self.physics.update_contacts()
+
+    # Updates components
+    def update(self):
+        if self.transform_store is not None:
+            self.transform_store.update()
+        self.activate()
+        self.event_bus.send_event("main", "update")
+        self.event_bus.flush()
+
+    # Advances the physics engine and updates components
+    def step(self, dt, substeps=None):
+        self.step_physics(dt, substeps)
+        self.update()
+
+    # Passes actions to components through the "action" event
+    def act(self, actions):
+        self.activate()
+        self.event_bus.send_event("main", "action", actions)
+
+    # Returns the current observation
+    # Components fill in the observation dict through the "observe" event
+    def observe(self):
+        observation = {}
+        self.activate()
+        self.event_bus.send_event("main", "observe", observation)
+        return observation
+
+    # Called when trial is finished
+    def trial_finished_callback(self):
+        self.finished = True
+        if self.finished_callback is not None:
+            self.finished_callback()
+
+    # Removes the environment's objects from the physics world and event system, keeping the scene graph
+    def clear_physics(self):
+        self.event_bus.clear()
+        self.physics.clear()
+        for constraint in self.physics_world.getConstraints():
+            self.physics_world.removeConstraint(constraint)
+        for body in self.physics_world.getRigidBodies():
+            self.physics_world.removeRigidBody(body)
+        for child in self.panda_root_node.getChildren():
+            child.removeNode()
+
+    # Removes the environment's objects from the physics world and scene
+    def clear_scene(self):
+        self.clear_physics()
+        self.root_node = None
+        self.transform_store = None
+        self.snapshot = None
+
+    # Removes the environment from the scene
+    def destroy(self):
+        self.clear_scene()
+        self.panda_root_node.removeNode()
@@ -0,0 +1,101 @@
+"""
+Plays out several copies of an environment in lockstep.
+
+@author Ben Giacalone
+"""
+import json
+import sys
+import time
+from direct.showbase.ShowBase import ShowBase
+from direct.showbase.ShowBaseGlobal import globalClock
+from direct.task.Task import Task
+from tools.envedit.edenv_component import EComponent
+from tools.envedit.gizmos.gizmo_system import GizmoSystem
+from tools.run.shape_cache import ShapeCache
+from tools.run.simulation import Simulation
+
+
+class VectorPlayer(ShowBase):
+
+    # If "fixed_dt" is given, copies step the physics engine by "fixed_dt" split into "substeps" steps,
+    # as fast as possible
+    def __init__(self, env_name, num_envs, fixed_dt=None, substeps=1):
+        ShowBase.__init__(self, windowType="none")
+
+        # Allows importing components from project folder
+        sys.path.append(".")
+
+        EComponent.base = self
+        self.num_envs = num_envs
+        self.fixed_dt = fixed_dt
+        self.substeps = substeps
+        self.simulations = []
+        self.trial_steps = 0            # Number of environment frames simulated in the last trials
+        self.trial_time = 0             # Seconds spent simulating the last trials
+        self.trial_awake_bodies = 0     # Number of rigid body updates made in the last trials
+        self.trial_sleeping_bodies = 0  # Number of sleeping rigid body updates skipped in the last trials
+
+        # Read the environment once, every copy is created from it
+        with open(env_name + ".json", "r") as file:
+            self.scene_dict = json.load(file)
+
+    # Resets the environment copies for new trials, one per trial data dict
+    # Existing copies are reused, and copies are only created or removed when the number of trials changes
+    def reset(self, trial_data_list):
+        while len(self.simulations) > len(trial_data_list):
+            self.simulations.pop().destroy()
+        GizmoSystem.gizmos = [None for _ in range(256)]
+        ShapeCache.reset_counts()
+        for i in range(len(trial_data_list)):
+            if i < len(self.simulations):
+                self.simulations[i].reset(trial_data_list[i])
+            else:
+                simulation = Simulation(self.scene_dict, trial_data_list[i], self.render, f"Root_{i}")
+                self.simulations.append(simulation)
+
+    # Advances all unfinished environment copies by one frame
+    # Returns whether each copy has finished its trial
+    def step(self, dt, substeps=None):
+        for simulation in self.simulations:
+            if not simulation.finished:
+                simulation.step(dt, substeps)
+                self.trial_steps += 1
+        return [simulation.finished for simulation in self.simulations]
+
+    # Runs a trial on each environment copy until all of them finish, and returns the trial data
+    def run_trials(self, trial_data_list):
+        self.reset(trial_data_list)
+        self.trial_steps = 0
+        start_time = time.perf_counter()
+
+        if self.fixed_dt is not None:
+            # Step without the task manager, so there is no frame pacing
+            while not all(self.step(self.fixed_dt, self.substeps)):
+                pass
+        else:
+            self.taskMgr.add(self.step_task, "step_task")
+            while not all(simulation.finished for simulation in self.simulations):
+                self.taskMgr.step()
+            self.taskMgr.remove("step_task")
+
+        self.trial_time = time.perf_counter() - start_time
+        self.trial_awake_bodies = sum(simulation.physics.bodies.synced_bodies for simulation in self.simulations)
+        self.trial_sleeping_bodies = sum(simulation.physics.bodies.skipped_bodies for simulation in self.simulations)
+        return trial_data_list
+
+    # Steps the environment copies every frame
+    def step_task(self, task):
+        self.step(globalClock.getDt())
+        return Task.cont
+
+    # Removes all environment copies
+    def destroy_simulations(self):
+        for simulation in self.simulations:
+            simulation.destroy()
+        self.simulations = []
+        GizmoSystem.gizmos = [None for _ in range(256)]
+
+    # Removes all environment copies before shutting down Panda3D
+    def destroy(self):
+        self.destroy_simulations()
+        ShowBase.destroy(self)
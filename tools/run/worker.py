@@ -0,0 +1,30 @@
+"""
+Runs headless trials in worker processes.
+
+@author Ben Giacalone
+"""
+import sys
+
+from tools.run.player import Player
+
+# Player kept alive for the lifetime of the worker process
+worker_player = None
+
+
+# Sets up a worker process, loading the environment once
+def init_worker(environment, fixed_dt=None, substeps=1):
+    global worker_player
+
+    # Allows importing components from project folder
+    sys.path.append(".")
+
+    worker_player = Player(environment, headless=True, fixed_dt=fixed_dt, substeps=substeps)
+
+
+# Runs a single trial in a worker process
+# Returns its trial data, the number of frames simulated, the seconds spent simulating and the number of rigid body
+# updates made and skipped for sleeping or static bodies
+def run_trial(trial_data):
+    worker_player.run_trial(trial_data)
+    return (trial_data, worker_player.trial_steps, worker_player.trial_time, worker_player.trial_awake_bodies,
+            worker_player.trial_sleeping_bodies)